@@ -0,0 +1,75 @@
+"""Measure the client CPU overhead per call, the http layer being stubbed out.
+
+The legacy client replays the original payload building (dict with uuid id, headers update, serialization by
+requests) on top of the same client, to compare it with the pre-encoded payload fast path.
+
+Usage: python benchmarks/bench_encoding.py [calls]
+"""
+
+import json
+import sys
+import time
+import uuid
+from unittest.mock import patch
+
+from pysonrpc.jsonrpc import JsonRpcClient, Method
+
+URL = "http://127.0.0.1/jsonrpc"
+METHOD = "VideoLibrary.GetMovieDetails"
+PARAMS = {"movieid": 1419, "properties": ["title", "year"]}
+
+
+class StubResponse:
+    status_code = 200
+
+    def json(self):
+        return {"jsonrpc": "2.0", "id": 1, "result": "OK"}
+
+
+def stub_post(url, data=None, json=None, headers=None, auth=None):
+    # Serialize json payloads the way requests does, to account for it in the legacy path
+    if json is not None:
+        stub_post.dumps(json, allow_nan=False).encode("utf-8")
+    return StubResponse()
+
+
+stub_post.dumps = json.dumps  # type: ignore
+
+
+class LegacyClient(JsonRpcClient):
+    def _encode_jsonrpc_payload(self, method, params={}, req_id=None, prefix=None):
+        headers = {}
+        headers.update({"Content-Type": self.JSONRPC_CONTENT})
+        return {
+            self.JSONRPC_KEY: self.JSONRPC_VERSION,
+            self.JSONRPC_KEY_REQ_METHOD: method,
+            self.JSONRPC_KEY_REQ_PARAMS: params,
+            self.JSONRPC_KEY_ID: req_id or uuid.uuid4().hex,
+        }
+
+    def _http_post(self, url, payload, headers):
+        return stub_post(url, json=payload, headers=headers, auth=self._auth)
+
+
+def per_call_us(method, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        method.run(**PARAMS)
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def main():
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    clients = {
+        "legacy payload": LegacyClient(URL),
+        "fast path, uuid ids": JsonRpcClient(URL, uuid_ids=True),
+        "fast path, counter ids": JsonRpcClient(URL),
+    }
+
+    with patch("pysonrpc.jsonrpc.requests.post", stub_post):
+        for name, client in clients.items():
+            print(f"{name:24} {per_call_us(Method(METHOD, client=client), calls):6.2f} us/call")
+
+
+if __name__ == "__main__":
+    main()
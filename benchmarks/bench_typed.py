@@ -0,0 +1,72 @@
+"""Compare memory use and attribute access speed of plain dict results and typed results.
+
+Usage: python benchmarks/bench_typed.py [records]
+"""
+
+import gc
+import sys
+import time
+import tracemalloc
+
+from pysonrpc.typed import ResultDecoder
+
+TYPES = {
+    "Video.Details.Movie": {
+        "type": "object",
+        "properties": {
+            name: {"type": "string"}
+            for name in ["label", "title", "originaltitle", "plot", "genre", "file", "imdbnumber", "mpaa", "studio"]
+        }
+        | {name: {"type": "integer"} for name in ["movieid", "year", "runtime", "playcount", "top250", "setid"]}
+        | {name: {"type": "number"} for name in ["rating", "userrating"]},
+    }
+}
+RETURNS = {"type": "array", "items": {"$ref": "Video.Details.Movie"}}
+
+
+def make_records(count):
+    properties = TYPES["Video.Details.Movie"]["properties"]
+    return [
+        {
+            name: (i if prop["type"] == "integer" else float(i) if prop["type"] == "number" else f"{name}")
+            for name, prop in properties.items()
+        }
+        for i in range(count)
+    ]
+
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    records = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return records, size
+
+
+def access_time(records, getter, rounds=5):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for record in records:
+            getter(record)
+    return (time.perf_counter() - start) / (rounds * len(records)) * 1e9
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    decoder = ResultDecoder(TYPES)
+
+    dicts, dict_size = measure(lambda: make_records(count))
+    typed, typed_size = measure(lambda: decoder.decode(RETURNS, make_records(count)))
+
+    dict_ns = access_time(dicts, lambda record: (record["movieid"], record["title"], record["rating"]))
+    typed_ns = access_time(typed, lambda record: (record.movieid, record.title, record.rating))
+
+    print(f"{count} records")
+    print(f"dict:  {dict_size / 1e6:8.2f} MB  {dict_ns:6.1f} ns/record access")
+    print(f"typed: {typed_size / 1e6:8.2f} MB  {typed_ns:6.1f} ns/record access")
+    print(f"memory ratio: {dict_size / typed_size:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,6 @@
+from pysonrpc.balancer import JsonRpcBalancedClient
+from pysonrpc.coalesce import RequestCoalescer
+from pysonrpc.export import Exporter
 from pysonrpc.jsonrpc import (
     JsonRpcClient,
     JsonRpcClientError,
@@ -6,4 +9,10 @@ from pysonrpc.jsonrpc import (
     JsonRpcServerError,
     Method,
 )
+from pysonrpc.limiter import AdaptiveConcurrencyLimit, RequestLimiter, TokenBucket
+from pysonrpc.mockserver import JsonRpcMockServer
+from pysonrpc.parallel import ProcessDecoder
+from pysonrpc.recording import TrafficRecorder, read_recordings
+from pysonrpc.streaming import Stream
+from pysonrpc.typed import ResultDecoder
 from pysonrpc.version import __version__
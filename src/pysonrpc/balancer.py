@@ -0,0 +1,203 @@
+import logging
+import random
+import threading
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Union
+
+import requests
+
+from pysonrpc.jsonrpc import JsonRpcClient, JsonRpcClientError
+
+log = logging.getLogger(__name__)
+
+
+class Replica:
+    """Routing and health state of one server replica."""
+
+    def __init__(self, url: str) -> None:
+        self.url = url
+        self.outstanding = 0
+        self.latency: Optional[float] = None
+        self.failures = 0
+        self.ejected_until = 0.0
+        self.requests = 0
+        self.errors = 0
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}:{self.url}"
+
+    def is_available(self, now: float) -> bool:
+        return self.ejected_until <= now
+
+    def stats(self) -> Dict[str, Optional[float]]:
+        return {
+            "outstanding": self.outstanding,
+            "latency": self.latency,
+            "failures": self.failures,
+            "ejected": self.ejected_until > time.monotonic(),
+            "requests": self.requests,
+            "errors": self.errors,
+        }
+
+
+class JsonRpcBalancedClient(JsonRpcClient):
+    """Json rpc client spreading requests over several replicas of the same server.
+
+    Each request is routed to the available replica with the least outstanding requests, or the lowest latency
+    weighted by its outstanding requests (latency being an exponentially weighted moving average).
+    Replicas failing `max_failures` times in a row are ejected for `eject_time` seconds, then re-admitted on
+    probation (a single failure ejects them again). If `probe_interval` is set, a background thread also probes
+    every replica, re-admitting ejected ones as soon as they answer successfully within `probe_timeout` seconds.
+    Other options are the ones of `JsonRpcClient`.
+    """
+
+    POLICY_LEAST_OUTSTANDING = "least_outstanding"
+    POLICY_EWMA = "ewma"
+
+    def __init__(
+        self,
+        urls: List[str],
+        user: Optional[str] = None,
+        password: Optional[str] = None,
+        policy: str = POLICY_LEAST_OUTSTANDING,
+        ewma_decay: float = 0.3,
+        max_failures: int = 3,
+        eject_time: float = 30.0,
+        probe_interval: Optional[float] = None,
+        probe_method: Optional[str] = None,
+        probe_timeout: float = 5.0,
+        **options,
+    ) -> None:
+        if not urls:
+            raise JsonRpcClientError("At least one url is required")
+        if policy not in (self.POLICY_LEAST_OUTSTANDING, self.POLICY_EWMA):
+            raise JsonRpcClientError(f"Unknown balancing policy {policy}")
+
+        super().__init__(urls[0], user, password, **options)
+        self._replicas = [Replica(url) for url in urls]
+        self._policy = policy
+        self._ewma_decay = ewma_decay
+        self._max_failures = max_failures
+        self._eject_time = eject_time
+        self._probe_method = probe_method
+        self._probe_timeout = probe_timeout
+        self._lock = threading.Lock()
+        self._stop_probing = threading.Event()
+        self._prober: Optional[threading.Thread] = None
+        if probe_interval:
+            self.start_probing(probe_interval)
+
+    @property
+    def replicas(self) -> List[Replica]:
+        return self._replicas
+
+    def _score(self, replica: Replica) -> float:
+        if self._policy == self.POLICY_EWMA:
+            # Unmeasured replicas get a zero latency so that they are tried first
+            return (replica.latency or 0.0) * (replica.outstanding + 1)
+        return replica.outstanding
+
+    def _select(self) -> Replica:
+        """Pick the best available replica, or the best of all of them if they are all ejected."""
+        now = time.monotonic()
+        candidates = [replica for replica in self._replicas if replica.is_available(now)] or self._replicas
+        best = min(self._score(replica) for replica in candidates)
+        return random.choice([replica for replica in candidates if self._score(replica) == best])
+
+    def _on_success(self, replica: Replica, elapsed: Optional[float] = None) -> None:
+        if replica.ejected_until:
+            log.info(f"Replica {replica.url} re-admitted")
+        replica.failures = 0
+        replica.ejected_until = 0.0
+        if elapsed is not None:
+            if replica.latency is None:
+                replica.latency = elapsed
+            else:
+                replica.latency += self._ewma_decay * (elapsed - replica.latency)
+
+    def _on_failure(self, replica: Replica) -> None:
+        replica.errors += 1
+        replica.failures += 1
+        if replica.failures >= self._max_failures:
+            log.warning(f"Replica {replica.url} ejected after {replica.failures} consecutive failures")
+            replica.ejected_until = time.monotonic() + self._eject_time
+            # Once re-admitted, a single failure ejects it again
+            replica.failures = self._max_failures - 1
+
+    def _dispatch(self, send: Callable[[str], requests.Response]) -> requests.Response:
+        """Send a request to the selected replica, and update its state with the outcome."""
+        with self._lock:
+            replica = self._select()
+            replica.outstanding += 1
+            replica.requests += 1
+
+        start = time.monotonic()
+        response = None
+        try:
+            response = send(replica.url)
+            return response
+        finally:
+            with self._lock:
+                replica.outstanding -= 1
+                if response is not None and response.status_code < 500:
+                    self._on_success(replica, time.monotonic() - start)
+                else:
+                    self._on_failure(replica)
+
+    def _get(self, path: Optional[str], headers: Dict[str, str]) -> requests.Response:
+        return self._dispatch(lambda url: self._http_get(f"{url}/{path}" if path else url, headers))
+
+    def _post(self, payload: Union[bytes, Iterator[bytes]], headers: Dict[str, str]) -> requests.Response:
+        return self._dispatch(lambda url: self._http_post(url, payload, headers))
+
+    def _probe_replica(self, replica: Replica) -> None:
+        """Raise an exception if the replica doesn't answer successfully in time."""
+        if self._probe_method:
+            payload = self._encode_jsonrpc_payload(self._probe_method)
+            response = self._http_post(replica.url, payload, self._headers, timeout=self._probe_timeout)
+            self.jsonrpc_result(self._parse_response(response))
+        else:
+            self._check_response(self._http_get(replica.url, self._headers, timeout=self._probe_timeout))
+
+    def probe(self) -> None:
+        """Actively check all replicas, with a json rpc method if configured, or a get on their url.
+
+        A replica is healthy if it answers in time with a 200 response, and a json rpc result for the method.
+        """
+        for replica in self._replicas:
+            try:
+                self._probe_replica(replica)
+                healthy = True
+            except Exception as e:
+                log.debug(f"Probe of replica {replica.url} failed: {e}")
+                healthy = False
+
+            with self._lock:
+                if healthy:
+                    self._on_success(replica)
+                elif replica.is_available(time.monotonic()):
+                    self._on_failure(replica)
+
+    def start_probing(self, interval: float) -> None:
+        """Start probing replicas every `interval` seconds in a background thread."""
+        if self._prober:
+            return
+        self._stop_probing.clear()
+
+        def probe_loop():
+            while not self._stop_probing.wait(interval):
+                self.probe()
+
+        self._prober = threading.Thread(target=probe_loop, name="pysonrpc-prober", daemon=True)
+        self._prober.start()
+
+    def close(self) -> None:
+        """Stop the background probing, if started."""
+        self._stop_probing.set()
+        if self._prober:
+            self._prober.join()
+            self._prober = None
+
+    def stats(self) -> Dict[str, Dict[str, Optional[float]]]:
+        with self._lock:
+            return {replica.url: replica.stats() for replica in self._replicas}
@@ -1,13 +1,18 @@
 import json
 import logging
 import sys
+import threading
 import traceback
 from argparse import ArgumentParser, Namespace
 from typing import Optional
 
+import requests
 from prettytable import PrettyTable
 
 import pysonrpc
+from pysonrpc.export import Exporter
+from pysonrpc.mockserver import JsonRpcMockServer
+from pysonrpc.shell import JsonRpcShell
 
 log = logging.getLogger(__name__)
 
@@ -38,6 +43,45 @@ def command_run(cli: pysonrpc.JsonRpcEndpoint, args: Namespace):
     print(json.dumps(result, indent=2))
 
 
+def command_shell(cli: pysonrpc.JsonRpcEndpoint, args: Namespace):
+    # Keep the connection alive between calls
+    cli.client.session = requests.Session()
+    JsonRpcShell(cli).cmdloop()
+
+
+def command_export(cli: pysonrpc.JsonRpcEndpoint, args: Namespace):
+    exporter = Exporter(
+        cli,
+        args.output,
+        fmt=args.format,
+        compress=args.gzip,
+        page_size=args.page_size,
+        parallelism=args.parallelism,
+        checkpoint=args.checkpoint,
+        processes=args.processes,
+    )
+    counts = exporter.export(args.method, json.loads(args.params))
+    for method, count in counts.items():
+        print(f"{method}: {count} records exported to {exporter.output_path(method)}")
+
+
+def command_serve_mock(cli: Optional[pysonrpc.JsonRpcEndpoint], args: Namespace):
+    schema = None
+    if args.schema:
+        with open(args.schema, "r") as fp:
+            schema = json.load(fp)
+    server = JsonRpcMockServer(args.recording or [], schema=schema, latency_scale=args.latency_scale)
+    server.serve_http(args.host, args.port)
+    if args.tcp_port is not None:
+        server.serve_tcp(args.host, args.tcp_port)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+
+
 def _setup_logging(level: int = logging.INFO, filename: Optional[str] = None) -> None:
     """Configure standard logging."""
     logging.basicConfig(
@@ -49,7 +93,7 @@ def _parse_args() -> Namespace:
     parser = ArgumentParser(description="RPC client")
 
     parser.add_argument("--version", "-v", help="Display version", default=False, action="store_true")
-    parser.add_argument("--url", "-r", help="Host url, e.g 'http://192.168.0.1:8080'", required=True)
+    parser.add_argument("--url", "-r", help="Host url, e.g 'http://192.168.0.1:8080'", default=None)
     parser.add_argument("--user", "-u", help="username if using basic authentication", default=None)
     parser.add_argument("--password", "-p", help="Password if using basic authentication", default=None)
     parser.add_argument("--debug", "-d", default=False, action="store_true", help="Enable debug logging")
@@ -93,7 +137,57 @@ def _parse_args() -> Namespace:
     run_parser.add_argument("--raw", "-j", default=False, action="store_true", help="Raw json response")
     run_parser.set_defaults(func=command_run)
 
+    # Shell command
+    shell_parser = subparsers.add_parser("shell", help="Interactive shell, connecting and discovering methods once")
+    shell_parser.set_defaults(func=command_shell)
+
+    # Export command
+    export_parser = subparsers.add_parser("export", help="Export whole collections of paged methods to files")
+    export_parser.add_argument(
+        "--method", "-m", action="append", required=True, help="RPC method to export, can be repeated"
+    )
+    export_parser.add_argument(
+        "--params",
+        "-p",
+        default="{}",
+        help='Optional parameters per method as json, e.g: \'{"VideoLibrary.GetMovies": {"properties": ["title"]}}\'',
+    )
+    export_parser.add_argument("--output", "-o", default=".", help="Directory to write the files to")
+    export_parser.add_argument(
+        "--format", "-F", default=Exporter.FORMAT_NDJSON, choices=[Exporter.FORMAT_NDJSON, Exporter.FORMAT_CSV]
+    )
+    export_parser.add_argument("--gzip", "-z", default=False, action="store_true", help="Compress files with gzip")
+    export_parser.add_argument("--page-size", "-n", type=int, default=500, help="Number of records per request")
+    export_parser.add_argument("--parallelism", "-j", type=int, default=4, help="Number of concurrent requests")
+    export_parser.add_argument(
+        "--checkpoint", "-c", default=None, help="Progress file, to resume an interrupted export"
+    )
+    export_parser.add_argument(
+        "--processes", "-P", type=int, default=None, help="Number of processes decoding responses, none per default"
+    )
+    export_parser.set_defaults(func=command_export)
+
+    # Mock server command
+    mock_parser = subparsers.add_parser("serve-mock", help="Serve recorded or schema generated responses locally")
+    mock_parser.add_argument(
+        "--recording", "-i", action="append", help="NDJSON file of recorded calls to replay, can be repeated"
+    )
+    mock_parser.add_argument("--schema", "-s", default=None, help="Schema json file to generate responses from")
+    mock_parser.add_argument("--host", default="127.0.0.1", help="Address to listen on")
+    mock_parser.add_argument("--port", "-P", type=int, default=8080, help="Http port to listen on")
+    mock_parser.add_argument("--tcp-port", "-T", type=int, default=None, help="Optional tcp port to listen on")
+    mock_parser.add_argument(
+        "--latency-scale",
+        "-l",
+        type=float,
+        default=0.0,
+        help="Replay recorded latencies multiplied by this factor, 0 to answer as fast as possible",
+    )
+    mock_parser.set_defaults(func=command_serve_mock, endpoint=False)
+
     args = parser.parse_args()
+    if getattr(args, "endpoint", True) and not args.url:
+        parser.error("the following arguments are required: --url/-r")
     args.log_level = logging.DEBUG if args.debug else logging.INFO
 
     return args
@@ -109,15 +203,17 @@ def main() -> None:
         print(f"pysonrpc version {pysonrpc.__version__}", file=sys.stderr)
 
     try:
-        cli = pysonrpc.JsonRpcEndpoint(
-            args.url,
-            user=args.user,
-            password=args.password,
-            auto_detect=args.schema_discover,
-            schema_path=args.schema_discover_path,
-            schema_method=args.schema_discover_method,
-            json_file=args.method_file,
-        )
+        cli = None
+        if getattr(args, "endpoint", True):
+            cli = pysonrpc.JsonRpcEndpoint(
+                args.url,
+                user=args.user,
+                password=args.password,
+                auto_detect=args.schema_discover,
+                schema_path=args.schema_discover_path,
+                schema_method=args.schema_discover_method,
+                json_file=args.method_file,
+            )
 
         if hasattr(args, "func") and args.func:
             args.func(cli, args)
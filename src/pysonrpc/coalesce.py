@@ -0,0 +1,69 @@
+import json
+import threading
+from typing import Any, Callable, Dict, Iterable, Optional
+
+
+class _Flight:
+    """A request in progress, shared by all the callers waiting for it."""
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class RequestCoalescer:
+    """Single flight of identical concurrent requests.
+
+    Concurrent calls with the same key share the request started by the first one, and all get its result or error.
+    If a methods list is given, only those methods are coalesced.
+    Callers share the same result object, which must then not be modified in place.
+    """
+
+    def __init__(self, methods: Optional[Iterable[str]] = None) -> None:
+        self._methods = set(methods) if methods is not None else None
+        self._flights: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.coalesced = 0
+
+    def key(self, method: str, params: Any, headers: Optional[Dict[str, str]] = None) -> Optional[str]:
+        """Canonical key of a request, or None if it can't be coalesced."""
+        if self._methods is not None and method not in self._methods:
+            return None
+        try:
+            return json.dumps([method, params, headers or {}], sort_keys=True, separators=(",", ":"))
+        except (TypeError, ValueError):
+            return None
+
+    def run(self, key: str, func: Callable[[], Any]) -> Any:
+        """Execute func, unless an identical call is in progress, in which case wait and return its result."""
+        with self._lock:
+            self.calls += 1
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                self.coalesced += 1
+
+        assert flight is not None
+        if leader:
+            try:
+                flight.result = func()
+            except BaseException as e:
+                flight.error = e
+            finally:
+                with self._lock:
+                    del self._flights[key]
+                flight.done.set()
+        else:
+            flight.done.wait()
+
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"calls": self.calls, "coalesced": self.coalesced, "in_flight": len(self._flights)}
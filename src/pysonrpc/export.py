@@ -0,0 +1,216 @@
+import csv
+import gzip
+import io
+import json
+import logging
+import os
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import IO, Any, Deque, Dict, Iterable, List, Optional, Tuple
+
+from pysonrpc.jsonrpc import JsonRpcClientError, JsonRpcEndpoint
+from pysonrpc.parallel import ProcessDecoder
+
+log = logging.getLogger(__name__)
+
+
+def _read_page(result: Any) -> Tuple[List[Any], Optional[int]]:
+    """Extract the records of a page result, and the collection total if known (module level to run in processes)."""
+    if isinstance(result, list):
+        return result, None
+
+    records: List[Any] = []
+    for key, value in (result or {}).items():
+        if key != Exporter.PARAM_LIMITS and isinstance(value, list):
+            records = value
+            break
+    total = (result or {}).get(Exporter.PARAM_LIMITS, {}).get(Exporter.LIMITS_TOTAL)
+    return records, total
+
+
+class Exporter:
+    """Exports whole collections returned by paged methods to NDJSON or CSV files, optionally gzipped.
+
+    Methods are paged with the `limits` parameter ({"start": x, "end": y}), the total being read from the `limits`
+    of the first result, and the records from its list member (e.g "movies"). Methods are exported concurrently, their
+    pages being fetched by `parallelism` workers and written in order as they arrive. Each method keeps at most
+    `parallelism` pages in flight, so memory stays bounded whatever the collection size. If the server returns less
+    records than requested (e.g a server side page size cap), the export continues from the records actually returned
+    with pages of that size.
+    If `processes` is set, responses are decoded in a pool of processes (see `ProcessDecoder`) rather than in the
+    fetching threads, to use several cores on large collections.
+    Compressed files are written as a gzip member per page, which concatenated read as a single gzip file.
+    If a checkpoint file is set, progress and the file size are saved after each page written, and an interrupted
+    export resumes from the last page saved, the file being truncated to the size saved first (so that data written
+    after it, e.g a partial page, is dropped and written again).
+    """
+
+    FORMAT_NDJSON = "ndjson"
+    FORMAT_CSV = "csv"
+    PARAM_LIMITS = "limits"
+    LIMITS_START = "start"
+    LIMITS_END = "end"
+    LIMITS_TOTAL = "total"
+
+    def __init__(
+        self,
+        endpoint: JsonRpcEndpoint,
+        output_dir: str,
+        fmt: str = FORMAT_NDJSON,
+        compress: bool = False,
+        page_size: int = 500,
+        parallelism: int = 4,
+        checkpoint: Optional[str] = None,
+        processes: Optional[int] = None,
+    ) -> None:
+        if fmt not in (self.FORMAT_NDJSON, self.FORMAT_CSV):
+            raise JsonRpcClientError(f"Unknown export format {fmt}")
+        self._endpoint = endpoint
+        self._output_dir = output_dir
+        self._fmt = fmt
+        self._compress = compress
+        self._page_size = page_size
+        self._parallelism = max(1, parallelism)
+        self._checkpoint_file = checkpoint
+        self._processes = processes
+        self._decoder: Optional[ProcessDecoder] = None
+        self._checkpoint: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def output_path(self, method: str) -> str:
+        return os.path.join(self._output_dir, f"{method}.{self._fmt}{'.gz' if self._compress else ''}")
+
+    def _load_checkpoint(self) -> None:
+        self._checkpoint = {}
+        if self._checkpoint_file and os.path.exists(self._checkpoint_file):
+            with open(self._checkpoint_file, "r") as fp:
+                self._checkpoint = json.load(fp)
+
+    def _save_checkpoint(self, method: str, state: Dict[str, Any]) -> None:
+        if not self._checkpoint_file:
+            return
+        with self._lock:
+            self._checkpoint[method] = state
+            tmp_file = f"{self._checkpoint_file}.tmp"
+            with open(tmp_file, "w") as fp:
+                json.dump(self._checkpoint, fp)
+            os.replace(tmp_file, self._checkpoint_file)
+
+    def _fetch(
+        self, method: str, params: Dict[str, Any], start: int, page_size: int
+    ) -> Tuple[List[Any], Optional[int]]:
+        """Get a page of records, and the collection total if known."""
+        limits = {self.LIMITS_START: start, self.LIMITS_END: start + page_size}
+        page_params = {**params, self.PARAM_LIMITS: limits}
+        if self._decoder:
+            body = self._endpoint.client.request_bytes(method, page_params)
+            return self._decoder.submit(body, _read_page).result()
+        return _read_page(self._endpoint.client.request(method=method, params=page_params, raw=False))
+
+    def _open(self, method: str, size: Optional[int]) -> IO[bytes]:
+        """Open the output file, truncated to the given size to resume, or emptied if no size is given."""
+        path = self.output_path(method)
+        if size is None or not os.path.exists(path):
+            return open(path, "wb")
+        fp = open(path, "r+b")
+        fp.truncate(size)
+        fp.seek(size)
+        return fp
+
+    def _write(self, fp: IO[bytes], records: List[Any], columns: Optional[List[str]]) -> Optional[List[str]]:
+        """Write a page of records, returns the csv columns (taken from the first record if not known yet)."""
+        text = io.StringIO(newline="")
+        if self._fmt == self.FORMAT_NDJSON:
+            text.writelines(json.dumps(record, separators=(",", ":")) + "\n" for record in records)
+        else:
+            writer = csv.writer(text)
+            for record in records:
+                row = record if isinstance(record, dict) else {"value": record}
+                if columns is None:
+                    columns = list(row.keys())
+                    writer.writerow(columns)
+                writer.writerow([json.dumps(v) if isinstance(v, (dict, list)) else v for v in map(row.get, columns)])
+
+        data = text.getvalue().encode("utf-8")
+        # Each page is a complete gzip member, so that the file is valid after any page
+        fp.write(gzip.compress(data) if self._compress else data)
+        fp.flush()
+        return columns
+
+    def _export_method(self, method: str, params: Dict[str, Any], fetcher: ThreadPoolExecutor) -> int:
+        state = self._checkpoint.get(method, {})
+        offset = state.get("offset", 0)
+        if state.get("done"):
+            log.info(f"{method} already exported")
+            return offset
+
+        columns = state.get("columns")
+        page_size = state.get("page_size", self._page_size)
+        with self._open(method, state.get("size") if offset else None) as fp:
+            page_start = offset
+            records, total = self._fetch(method, params, page_start, page_size)
+            requested = page_size
+            pending: Deque[Tuple[int, int, Future]] = deque()
+            next_start = page_start + page_size
+            while True:
+                columns = self._write(fp, records, columns)
+                offset = page_start + len(records)
+                done = total is None or not records or offset >= total
+                self._save_checkpoint(
+                    method,
+                    {
+                        "offset": offset,
+                        "total": total,
+                        "columns": columns,
+                        "done": done,
+                        "size": fp.tell(),
+                        "page_size": page_size,
+                    },
+                )
+                if done or total is None:
+                    break
+
+                if len(records) < requested:
+                    # Short page, the server caps pages: pages in flight start at the wrong offsets, drop them and
+                    # continue from the records actually returned with pages of that size
+                    log.debug(f"{method}: {len(records)} records returned out of {requested}, page size reduced")
+                    for _, _, future in pending:
+                        future.cancel()
+                    pending.clear()
+                    page_size = len(records)
+                    next_start = offset
+
+                # Keep a window of pages in flight, written in order
+                while len(pending) < self._parallelism and next_start < total:
+                    future = fetcher.submit(self._fetch, method, params, next_start, page_size)
+                    pending.append((next_start, page_size, future))
+                    next_start += page_size
+                if not pending:
+                    break
+                page_start, requested, future = pending.popleft()
+                records, _ = future.result()
+
+        log.debug(f"{method}: {offset} records exported to {self.output_path(method)}")
+        return offset
+
+    def export(self, methods: Iterable[str], params: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, int]:
+        """Export the methods collections, with optional params per method, and return the records count of each."""
+        methods = list(methods)
+        params = params or {}
+        os.makedirs(self._output_dir, exist_ok=True)
+        self._load_checkpoint()
+
+        self._decoder = ProcessDecoder(self._processes) if self._processes else None
+        try:
+            with ThreadPoolExecutor(self._parallelism, thread_name_prefix="pysonrpc-export") as fetcher:
+                with ThreadPoolExecutor(max(1, len(methods))) as drivers:
+                    futures = {
+                        method: drivers.submit(self._export_method, method, params.get(method, {}), fetcher)
+                        for method in methods
+                    }
+                    return {method: future.result() for method, future in futures.items()}
+        finally:
+            if self._decoder:
+                self._decoder.close()
+                self._decoder = None
@@ -1,10 +1,22 @@
+import itertools
 import json
 import logging
+import time
 import uuid
-from typing import Any, Dict, List, Optional, Union
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
 import requests
 
+from pysonrpc.coalesce import RequestCoalescer
+from pysonrpc.limiter import RequestLimiter
+from pysonrpc.recording import TrafficRecorder
+from pysonrpc.streaming import has_streams, iter_payload
+
+if TYPE_CHECKING:
+    from pysonrpc.typed import ResultDecoder
+
 log = logging.getLogger(__name__)
 
 
@@ -21,7 +33,18 @@ class JsonRpcServerError(JsonRpcError):
 
 
 class JsonRpcClient:
-    """Implementation of a json rpc client."""
+    """Implementation of a json rpc client.
+
+    Identical concurrent requests can share a single round trip if `coalesce` is enabled, either for all methods or
+    for the given list of methods.
+    A limiter can be given to rate limit calls and adapt their concurrency to the server capacity.
+    Calls and responses are recorded if `record` is set to a recorder or the path of a file to record to.
+    Request ids are taken from a per client counter, or are random uuids if `uuid_ids` is set.
+    A requests session can be set to keep connections alive between requests.
+    Params values wrapped in a `Stream` (file-like objects sent as strings, base64 encoded if binary, or iterables sent
+    as arrays) are streamed, the payload being sent in chunks of `STREAM_CHUNK_SIZE` bytes with chunked transfer
+    encoding. Streamed values are recorded as a placeholder.
+    """
 
     # RPC message config
     JSONRPC_VERSION = "2.0"
@@ -46,9 +69,48 @@ class JsonRpcClient:
     JSONRPC_KEY_RESP_ERROR_MSG = "message"
     JSONRPC_KEY_RESP_ERROR_DATA = "data"
 
-    def __init__(self, url, user: Optional[str] = None, password: Optional[str] = None) -> None:
+    # Pre-encoded payload fragment
+    _PAYLOAD_ID = f',"{JSONRPC_KEY_ID}":'.encode()
+    STREAM_CHUNK_SIZE = 64 * 1024
+
+    def __init__(
+        self,
+        url,
+        user: Optional[str] = None,
+        password: Optional[str] = None,
+        coalesce: Union[bool, Iterable[str]] = False,
+        limiter: Optional[RequestLimiter] = None,
+        record: Union[str, TrafficRecorder, None] = None,
+        uuid_ids: bool = False,
+        session: Optional[requests.Session] = None,
+    ) -> None:
         self._url = url
+        self.session = session
         self._auth = self._build_credentials(user, password)
+        self._headers = {"Content-Type": self.JSONRPC_CONTENT}
+        self._uuid_ids = uuid_ids
+        # next() on a count is atomic, no lock needed to share it between threads
+        self._ids = itertools.count(1)
+        self._prefixes: Dict[str, bytes] = {}
+        # Strict json as sent by requests, NaN and infinite values being refused
+        self._encode_json = json.JSONEncoder(separators=(",", ":"), allow_nan=False).encode
+        self._limiter = limiter
+        self._recorder = TrafficRecorder(record) if isinstance(record, str) else record
+        self._coalescer = None
+        if coalesce:
+            self._coalescer = RequestCoalescer(None if coalesce is True else coalesce)
+
+    @property
+    def coalescer(self) -> Optional[RequestCoalescer]:
+        return self._coalescer
+
+    @property
+    def limiter(self) -> Optional[RequestLimiter]:
+        return self._limiter
+
+    @property
+    def recorder(self) -> Optional[TrafficRecorder]:
+        return self._recorder
 
     def _build_credentials(self, user: Optional[str], password: Optional[str]) -> Optional[Any]:
         """Build http basic auth credentials per default."""
@@ -59,29 +121,84 @@ class JsonRpcClient:
     def _random_id(self) -> str:
         return uuid.uuid4().hex
 
-    def _build_jsonrpc_payload(
-        self, method: str, params: Dict[str, Any] = {}, req_id: Optional[Union[int, str]] = None
-    ) -> Dict[str, Any]:
-        """Create JSON-RPC payload."""
-        return {
-            self.JSONRPC_KEY: self.JSONRPC_VERSION,
-            self.JSONRPC_KEY_REQ_METHOD: method,
-            self.JSONRPC_KEY_REQ_PARAMS: params,
-            self.JSONRPC_KEY_ID: req_id or self._random_id(),
-        }
+    def _next_id(self) -> Union[int, str]:
+        return self._random_id() if self._uuid_ids else next(self._ids)
+
+    @classmethod
+    def payload_prefix(cls, method: str) -> bytes:
+        """Pre-encoded start of the JSON-RPC payload of a method, up to its params."""
+        return (
+            f'{{"{cls.JSONRPC_KEY}":"{cls.JSONRPC_VERSION}",'
+            f'"{cls.JSONRPC_KEY_REQ_METHOD}":{json.dumps(method)},"{cls.JSONRPC_KEY_REQ_PARAMS}":'
+        ).encode()
+
+    def _encode_jsonrpc_payload(
+        self,
+        method: str,
+        params: Any = {},
+        req_id: Optional[Union[int, str]] = None,
+        prefix: Optional[bytes] = None,
+    ) -> Union[bytes, Iterator[bytes]]:
+        """Create JSON-RPC payload, only params and id being encoded per call, streamed if params hold streams."""
+        if prefix is None:
+            prefix = self._prefixes.get(method)
+            if prefix is None:
+                prefix = self._prefixes[method] = self.payload_prefix(method)
+        req_id = req_id or self._next_id()
+        encoded_id = str(req_id) if type(req_id) is int else self._encode_json(req_id)
+        try:
+            encoded_params = self._encode_json(params)
+        except TypeError:
+            # Streams are not json serializable, only look for them when encoding failed to keep calls fast
+            if not has_streams(params):
+                raise
+            suffix = b"".join((self._PAYLOAD_ID, encoded_id.encode(), b"}"))
+            return iter_payload(prefix, params, suffix, self.STREAM_CHUNK_SIZE)
+        return b"".join((prefix, encoded_params.encode(), self._PAYLOAD_ID, encoded_id.encode(), b"}"))
+
+    def _check_response(self, response: requests.Response) -> None:
+        """Raise an exception if the response is not a success."""
+        if response is None:
+            raise JsonRpcServerError(f"Couldn't get response from server: {response}")
+        if response.status_code != 200:
+            raise JsonRpcServerError(f"Couldn't get data response code {response.status_code}: {response.reason}")
 
     def _parse_response(self, response: requests.Response, raw: bool = True) -> Dict[str, Any]:
         """Extract json result from response upon success or raise an exception."""
-        if response is not None:
-            if response.status_code == 200:
-                try:
-                    raw_json = response.json()
-                    return raw_json if raw else self.jsonrpc_result(raw_json)
-                except json.JSONDecodeError as e:
-                    raise JsonRpcServerError(f"Invalid json response: {response.text}") from e
+        if response is None or response.status_code != 200:
+            self._check_response(response)
+        try:
+            raw_json = response.json()
+            return raw_json if raw else self.jsonrpc_result(raw_json)
+        except json.JSONDecodeError as e:
+            raise JsonRpcServerError(f"Invalid json response: {response.text}") from e
 
-            raise JsonRpcServerError(f"Couldn't get data response code {response.status_code}: {response.reason}")
-        raise JsonRpcServerError(f"Couldn't get response from server: {response}")
+    def _http_get(self, url: str, headers: Dict[str, str], timeout: Optional[float] = None) -> requests.Response:
+        log.debug(f"JSON RPC get to {url}")
+        # Timeouts are only passed when set, e.g for health probes
+        options: Dict[str, Any] = {"timeout": timeout} if timeout else {}
+        return (self.session or requests).get(url, headers=headers, auth=self._auth, **options)
+
+    def _http_post(
+        self,
+        url: str,
+        payload: Union[bytes, Iterator[bytes]],
+        headers: Dict[str, str],
+        timeout: Optional[float] = None,
+    ) -> requests.Response:
+        # Hot path, only format the message if it's actually logged
+        log.debug("JSON RPC request to %s: %s", url, payload)
+        if timeout:
+            return (self.session or requests).post(url, data=payload, headers=headers, auth=self._auth, timeout=timeout)
+        return (self.session or requests).post(url, data=payload, headers=headers, auth=self._auth)
+
+    def _get(self, path: Optional[str], headers: Dict[str, str]) -> requests.Response:
+        """Send a get to the server url, overridden by clients spreading requests over several urls."""
+        return self._http_get(f"{self._url}/{path}" if path else self._url, headers)
+
+    def _post(self, payload: Union[bytes, Iterator[bytes]], headers: Dict[str, str]) -> requests.Response:
+        """Post a payload to the server url, overridden by clients spreading requests over several urls."""
+        return self._http_post(self._url, payload, headers)
 
     def get(self, path: Optional[str] = None, headers: Dict[str, str] = {}) -> Dict[str, Any]:
         """Send a get requests to the server."""
@@ -92,10 +209,8 @@ class JsonRpcClient:
         )
 
         # Make the JSON-RPC request using the requests library
-        url = f"{self._url}/{path}" if path else self._url
-        log.debug(f"JSON RPC get to {url}")
         try:
-            response = requests.get(url, headers=headers, auth=self._auth)
+            response = self._get(path, headers)
         except Exception as e:
             raise JsonRpcClientError(f"Request error: {e}") from e
 
@@ -108,24 +223,91 @@ class JsonRpcClient:
         req_id: Optional[Union[int, str]] = None,
         headers: Dict[str, str] = {},
         raw: bool = True,
+        payload_prefix: Optional[bytes] = None,
     ) -> Dict[str, Any]:
-        """Sends a json rpc request, with optional headers and id and return the json result or the raw response."""
-        payload = self._build_jsonrpc_payload(method, params, req_id)
-        headers.update(
-            {
-                "Content-Type": self.JSONRPC_CONTENT,
-            }
-        )
+        """Sends a json rpc request, with optional headers and id and return the json result or the raw response.
+
+        The payload prefix of the method can be given if already encoded, see `payload_prefix`.
+        """
+        headers = {**headers, **self._headers} if headers else self._headers
+
+        # Identical concurrent requests share the same response, unless the caller needs its own id
+        if self._coalescer and req_id is None:
+            key = self._coalescer.key(method, params, headers)
+            if key is not None:
+                raw_json = self._coalescer.run(
+                    key, lambda: self._request(method, params, None, headers, payload_prefix=payload_prefix)
+                )
+                return raw_json if raw else self.jsonrpc_result(raw_json)
+
+        return self._request(method, params, req_id, headers, raw, payload_prefix)
+
+    def _request(
+        self,
+        method,
+        params: Dict[str, Any],
+        req_id: Optional[Union[int, str]],
+        headers: Dict[str, str],
+        raw: bool = True,
+        payload_prefix: Optional[bytes] = None,
+    ) -> Dict[str, Any]:
+        response, elapsed = self._send(method, params, req_id, headers, payload_prefix)
+        raw_json = self._parse_response(response)
+        if self._recorder:
+            self._recorder.record(method, params, raw_json, elapsed)
+        return raw_json if raw else self.jsonrpc_result(raw_json)
+
+    def _send(
+        self,
+        method,
+        params: Dict[str, Any],
+        req_id: Optional[Union[int, str]],
+        headers: Dict[str, str],
+        payload_prefix: Optional[bytes] = None,
+    ) -> Tuple[requests.Response, float]:
+        """Post a request within the limits if any, returns the response and the time it took."""
+        try:
+            payload = self._encode_jsonrpc_payload(method, params, req_id, payload_prefix)
+        except (TypeError, ValueError) as e:
+            raise JsonRpcClientError(f"Request error: {e}") from e
+
+        slot = None
+        if self._limiter:
+            slot = self._limiter.acquire(method)
+            if not slot:
+                raise JsonRpcClientError(f"Request limits not cleared in time for {method}")
 
         # Make the JSON-RPC request using the requests library
-        log.debug(f"JSON RPC request to {self._url}: {payload}")
+        response = None
+        start = time.monotonic()
         try:
-            response = requests.post(self._url, json=payload, headers=headers, auth=self._auth)
+            response = self._post(payload, headers)
 
         except Exception as e:
             raise JsonRpcClientError(f"Request error: {e}") from e
 
-        return self._parse_response(response, raw)
+        finally:
+            if self._limiter and slot:
+                self._limiter.release(slot, overloaded=response is None or response.status_code >= 500)
+
+        return response, time.monotonic() - start
+
+    def request_bytes(
+        self,
+        method,
+        params={},
+        req_id: Optional[Union[int, str]] = None,
+        headers: Dict[str, str] = {},
+        payload_prefix: Optional[bytes] = None,
+    ) -> bytes:
+        """Sends a json rpc request and return the undecoded response body, e.g to decode it in another process.
+
+        Such requests are neither coalesced nor recorded.
+        """
+        headers = {**headers, **self._headers} if headers else self._headers
+        response, _ = self._send(method, params, req_id, headers, payload_prefix)
+        self._check_response(response)
+        return response.content
 
     def jsonrpc_error(
         self, error: int, message: str, data: Optional[Any] = None, req_id: Optional[int] = None
@@ -142,11 +324,12 @@ class JsonRpcClient:
             error_message[self.JSONRPC_KEY_RESP_ERROR][self.JSONRPC_KEY_RESP_ERROR_DATA] = data  # type: ignore
         return error_message
 
-    def jsonrpc_result(self, response: Dict[str, Any]) -> Dict[str, Any]:
-        if self.JSONRPC_KEY_RESP_RESULT in response:
-            return response[self.JSONRPC_KEY_RESP_RESULT]
-        elif self.JSONRPC_KEY_RESP_ERROR in response and isinstance(response[self.JSONRPC_KEY_RESP_ERROR], dict):
-            raise JsonRpcServerError(response[self.JSONRPC_KEY_RESP_ERROR].get(self.JSONRPC_KEY_RESP_ERROR_MSG))
+    @classmethod
+    def jsonrpc_result(cls, response: Dict[str, Any]) -> Dict[str, Any]:
+        if cls.JSONRPC_KEY_RESP_RESULT in response:
+            return response[cls.JSONRPC_KEY_RESP_RESULT]
+        elif cls.JSONRPC_KEY_RESP_ERROR in response and isinstance(response[cls.JSONRPC_KEY_RESP_ERROR], dict):
+            raise JsonRpcServerError(response[cls.JSONRPC_KEY_RESP_ERROR].get(cls.JSONRPC_KEY_RESP_ERROR_MSG))
         else:
             raise JsonRpcServerError(f"Invalid json rpc response: {response}")
 
@@ -181,13 +364,22 @@ class Method(MethodContainer):
     PROP_PARAM_NAME = "name"
     NAMESPACE_SEP = "."
 
-    def __init__(self, name, properties={}, exec: bool = True, client: Optional[JsonRpcClient] = None) -> None:
+    def __init__(
+        self,
+        name,
+        properties={},
+        exec: bool = True,
+        client: Optional[JsonRpcClient] = None,
+        decoder: Optional["ResultDecoder"] = None,
+    ) -> None:
         self._fullname = name
         self._parents = name.split(self.NAMESPACE_SEP)
         self._name = self._parents.pop()
         self._properties = properties or {}
         self._exec = exec
         self._client = client
+        self._decoder = decoder
+        self._payload_prefix = client.payload_prefix(name) if client else None
 
     def __repr__(self) -> str:
         return f"{self.__class__.__name__}:{self.name}{self.param_list()}"
@@ -197,11 +389,18 @@ class Method(MethodContainer):
         return self.run if self._exec else self
 
     def run(self, *args, raw=True, **kwargs) -> Dict[str, Any]:
-        """Executes this method."""
+        """Executes this method, decoding the result into typed objects if a decoder is set and raw is False."""
         if self._client:
-            return self._client.request(method=self._fullname, params=kwargs, raw=raw)
+            result = self._client.request(
+                method=self._fullname, params=kwargs, raw=raw, payload_prefix=self._payload_prefix
+            )
+            return self.decode(result) if not raw else result
         return {}
 
+    def decode(self, result: Any) -> Any:
+        """Decode a result into typed objects according to the returns definition, if a decoder is set."""
+        return self._decoder.decode(self.returns, result) if self._decoder else result
+
     def param_list(self) -> List[str]:
         return [param.get(self.PROP_PARAM_NAME) for param in self.params]
 
@@ -237,11 +436,16 @@ class Method(MethodContainer):
 class JsonRpcEndpoint(MethodContainer):
     """Create a jsonrpc endpoint with methods dynamically defined based on the json schema definition,
     or a list of manually created ones.
+
+    The url can be a list of urls of replicas sharing the same schema, requests are then balanced across them,
+    or a preconfigured client can be given instead.
+    If `typed_results` is set, non raw results are decoded into slotted dataclasses generated from the schema, with
+    properties not in the schema dropped or kept according to `unknown_fields` ("drop" or "keep").
     """
 
     def __init__(
         self,
-        url,
+        url: Union[str, List[str], None],
         user: Optional[str] = None,
         password: Optional[str] = None,
         json_file: Optional[str] = None,
@@ -249,10 +453,24 @@ class JsonRpcEndpoint(MethodContainer):
         schema_method: Optional[str] = None,
         schema: Optional[Dict[str, Any]] = None,
         auto_detect: Optional[bool] = False,
+        client: Optional[JsonRpcClient] = None,
+        coalesce: Union[bool, Iterable[str]] = False,
+        limiter: Optional[RequestLimiter] = None,
+        record: Union[str, TrafficRecorder, None] = None,
+        typed_results: bool = False,
+        unknown_fields: str = "drop",
     ) -> None:
-        # Create rpc client
-        self.client = JsonRpcClient(url, user, password)
+        # Create rpc client, the schema is discovered once through it whatever the number of replicas
+        self.client = client or self._build_client(
+            url, user, password, coalesce=coalesce, limiter=limiter, record=record
+        )
         self._methods: Dict[str, Any] = {}
+        self._types: Dict[str, Any] = {}
+        self._decoder = None
+        if typed_results:
+            from pysonrpc.typed import ResultDecoder
+
+            self._decoder = ResultDecoder(self._types, unknown_fields)
 
         # Load methods definition from all defined source: Manual, dict, file, urlx
         methods_list = []
@@ -270,6 +488,19 @@ class JsonRpcEndpoint(MethodContainer):
     def methods(self):
         return self._methods
 
+    @property
+    def types(self):
+        return self._types
+
+    def _build_client(
+        self, url: Union[str, List[str], None], user: Optional[str], password: Optional[str], **options
+    ) -> JsonRpcClient:
+        if isinstance(url, (list, tuple)):
+            from pysonrpc.balancer import JsonRpcBalancedClient
+
+            return JsonRpcBalancedClient(list(url), user, password, **options)
+        return JsonRpcClient(url, user, password, **options)
+
     def _add_methods(self, methods_list):
         """From the method list, build direct access list and tree:
         - populate a dict for direct access based on fullname,
@@ -290,8 +521,9 @@ class JsonRpcEndpoint(MethodContainer):
         methods = []
 
         if json_schema and "methods" in json_schema:
+            self._types.update(json_schema.get("types") or {})
             for method_name, method_props in json_schema["methods"].items():
-                methods.append(Method(method_name, method_props, client=self.client))
+                methods.append(Method(method_name, method_props, client=self.client, decoder=self._decoder))
         return methods
 
     def _methods_from_file(self, json_file: str) -> List[Method]:
@@ -307,5 +539,56 @@ class JsonRpcEndpoint(MethodContainer):
 
     def run_method(self, method, *args, raw: bool = True, **kwargs) -> Dict[str, Any]:
         if self.client:
-            return self.client.request(method=method, params=kwargs, raw=raw)
+            result = self.client.request(method=method, params=kwargs, raw=raw)
+            if not raw and method in self._methods:
+                return self._methods[method].decode(result)
+            return result
         return {}
+
+    def map(
+        self,
+        method: str,
+        params_list: Iterable[Dict[str, Any]],
+        transform: Optional[Callable[[Any], Any]] = None,
+        threads: int = 4,
+        processes: Optional[int] = None,
+    ) -> Iterator[Any]:
+        """Run a method once per params set with `threads` concurrent requests, and yield the results in order.
+
+        Results are decoded as by `run_method` and transformed if a transform is given. If `processes` is set, raw
+        responses are decoded and transformed in a pool of processes (see `ProcessDecoder`) instead, the transform then
+        having to be picklable and results not being decoded into typed objects.
+        """
+        from pysonrpc.parallel import ProcessDecoder
+
+        decoder = ProcessDecoder(processes) if processes else None
+        prefix = self.client.payload_prefix(method)
+        known_method = self._methods.get(method)
+
+        def run(params: Dict[str, Any]) -> Any:
+            if decoder:
+                return decoder.submit(self.client.request_bytes(method, params, payload_prefix=prefix), transform)
+            result = self.client.request(method, params, raw=False, payload_prefix=prefix)
+            if known_method:
+                result = known_method.decode(result)
+            return transform(result) if transform else result
+
+        def next_result(future: Future) -> Any:
+            result = future.result()
+            return result.result() if decoder else result
+
+        # Keep a bounded window of calls in flight, so that params and results are not all held in memory
+        pending: Deque[Future] = deque()
+        with ThreadPoolExecutor(threads, thread_name_prefix="pysonrpc-map") as fetcher:
+            try:
+                for params in params_list:
+                    pending.append(fetcher.submit(run, params))
+                    if len(pending) >= threads * 2:
+                        yield next_result(pending.popleft())
+                while pending:
+                    yield next_result(pending.popleft())
+            finally:
+                for future in pending:
+                    future.cancel()
+                if decoder:
+                    decoder.close()
@@ -0,0 +1,218 @@
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Union
+
+log = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Static rate limit of `rate` calls per second, allowing bursts of `burst` calls."""
+
+    def __init__(self, rate: float, burst: Optional[float] = None) -> None:
+        self._rate = rate
+        self._capacity = burst or max(rate, 1.0)
+        self._tokens = self._capacity
+        self._last = time.monotonic()
+        self._waiting = 0
+        self._lock = threading.Lock()
+
+    @property
+    def rate(self) -> float:
+        return self._rate
+
+    @property
+    def waiting(self) -> int:
+        """Number of callers currently waiting for a token."""
+        return self._waiting
+
+    def refund(self) -> None:
+        """Give back a token taken for a call that wasn't made."""
+        with self._lock:
+            self._tokens = min(self._capacity, self._tokens + 1)
+
+    def acquire(self, deadline: float) -> bool:
+        """Take a token, waiting for one until the deadline (from `time.monotonic`), returns False if none came."""
+        waiting = False
+        try:
+            while True:
+                with self._lock:
+                    now = time.monotonic()
+                    self._tokens = min(self._capacity, self._tokens + (now - self._last) * self._rate)
+                    self._last = now
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return True
+                    wait = (1 - self._tokens) / self._rate
+                    if now + wait > deadline:
+                        return False
+                    if not waiting:
+                        waiting = True
+                        self._waiting += 1
+                time.sleep(wait)
+        finally:
+            if waiting:
+                with self._lock:
+                    self._waiting -= 1
+
+
+class AdaptiveConcurrencyLimit:
+    """Concurrency limit adapting to the server capacity with an AIMD algorithm.
+
+    The limit grows additively (by about 1 per limit of successful calls) while latency stays under `tolerance` times
+    the lowest latency recently observed for the same key (e.g the method, as calls of different methods can take very
+    different times), and shrinks multiplicatively by `backoff` on higher latencies or server overload errors. The
+    lowest latency of a key is forgotten every `window` samples of that key to follow server changes.
+    """
+
+    def __init__(
+        self,
+        initial: int = 10,
+        min_limit: int = 1,
+        max_limit: int = 200,
+        tolerance: float = 2.0,
+        backoff: float = 0.9,
+        window: int = 500,
+        on_change: Optional[Callable[[int], None]] = None,
+    ) -> None:
+        self._limit = float(initial)
+        self._min_limit = min_limit
+        self._max_limit = max_limit
+        self._tolerance = tolerance
+        self._backoff = backoff
+        self._window = window
+        self._on_change = on_change
+        self._min_latencies: Dict[str, float] = {}
+        self._samples: Dict[str, int] = {}
+        self._in_flight = 0
+        self._queued = 0
+        self._changes = 0
+        self._cond = threading.Condition()
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    def acquire(self, deadline: float) -> bool:
+        """Wait for a free slot until the deadline (from `time.monotonic`), returns False if none came."""
+        with self._cond:
+            self._queued += 1
+            try:
+                if not self._cond.wait_for(
+                    lambda: self._in_flight < int(self._limit), timeout=max(0.0, deadline - time.monotonic())
+                ):
+                    return False
+            finally:
+                self._queued -= 1
+            self._in_flight += 1
+            return True
+
+    def release(self, latency: float, overloaded: bool = False, key: str = "") -> None:
+        """Free a slot, and adapt the limit to the call outcome, its latency being compared to others of the same key."""
+        with self._cond:
+            saturated = self._in_flight >= int(self._limit)
+            self._in_flight -= 1
+
+            samples = self._samples.get(key, 0)
+            if samples % self._window == 0:
+                self._min_latencies.pop(key, None)
+            self._samples[key] = samples + 1
+            min_latency = self._min_latencies.get(key)
+            if not overloaded and (min_latency is None or latency < min_latency):
+                min_latency = self._min_latencies[key] = latency
+
+            previous = int(self._limit)
+            if overloaded or (min_latency and latency > min_latency * self._tolerance):
+                self._limit = max(float(self._min_limit), self._limit * self._backoff)
+            elif saturated:
+                # Only grow when the limit was actually reached, idle clients shouldn't inflate it
+                self._limit = min(float(self._max_limit), self._limit + 1 / self._limit)
+
+            if int(self._limit) != previous:
+                self._changes += 1
+                log.debug(f"Concurrency limit changed from {previous} to {int(self._limit)}")
+                if self._on_change:
+                    self._on_change(int(self._limit))
+            self._cond.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "limit": int(self._limit),
+                "in_flight": self._in_flight,
+                "queued": self._queued,
+                "limit_changes": self._changes,
+                "min_latencies": dict(self._min_latencies),
+            }
+
+
+class _Slot:
+    """A call allowed by the limiter, to give back on completion."""
+
+    def __init__(self, method: str) -> None:
+        self.method = method
+        self.start = time.monotonic()
+
+
+class RequestLimiter:
+    """Client side limiter, combining static rates and an adaptive concurrency limit.
+
+    Rates are calls per second keyed by method name, namespace (applying to all its methods and sub namespaces),
+    or "*" for all other methods. Calls over the limits are queued for up to `max_wait` seconds.
+    """
+
+    ANY_METHOD = "*"
+    NAMESPACE_SEP = "."
+
+    def __init__(
+        self,
+        rates: Optional[Dict[str, Union[float, TokenBucket]]] = None,
+        concurrency: Optional[AdaptiveConcurrencyLimit] = None,
+        max_wait: float = 10.0,
+    ) -> None:
+        self._buckets = {
+            key: rate if isinstance(rate, TokenBucket) else TokenBucket(rate) for key, rate in (rates or {}).items()
+        }
+        self._concurrency = concurrency
+        self._max_wait = max_wait
+
+    @property
+    def concurrency(self) -> Optional[AdaptiveConcurrencyLimit]:
+        return self._concurrency
+
+    def _bucket(self, method: str) -> Optional[TokenBucket]:
+        """Find the rate of the method, or the one of its closest namespace."""
+        name = method
+        while name:
+            if name in self._buckets:
+                return self._buckets[name]
+            name = name.rpartition(self.NAMESPACE_SEP)[0]
+        return self._buckets.get(self.ANY_METHOD)
+
+    def acquire(self, method: str) -> Optional[_Slot]:
+        """Wait until the method can be called, returns None if the limits weren't cleared in time."""
+        deadline = time.monotonic() + self._max_wait
+        bucket = self._bucket(method)
+        if bucket and not bucket.acquire(deadline):
+            return None
+        if self._concurrency and not self._concurrency.acquire(deadline):
+            # No call made, it shouldn't count against the rate
+            if bucket:
+                bucket.refund()
+            return None
+        return _Slot(method)
+
+    def release(self, slot: _Slot, overloaded: bool = False) -> None:
+        if self._concurrency:
+            self._concurrency.release(time.monotonic() - slot.start, overloaded, slot.method)
+
+    def stats(self) -> Dict[str, Any]:
+        """Concurrency limit stats if any, and the number of calls waiting for each rate.
+
+        The queue depth ("queued") counts both the calls waiting for a rate and the ones waiting for a slot.
+        """
+        stats: Dict[str, Any] = dict(self._concurrency.stats()) if self._concurrency else {}
+        if self._buckets:
+            stats["rate_queued"] = {key: bucket.waiting for key, bucket in self._buckets.items()}
+            stats["queued"] = stats.get("queued", 0) + sum(stats["rate_queued"].values())
+        return stats
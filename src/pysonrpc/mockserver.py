@@ -0,0 +1,216 @@
+import itertools
+import json
+import logging
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from pysonrpc.jsonrpc import JsonRpcClient
+from pysonrpc.recording import TrafficRecorder, read_recordings
+
+log = logging.getLogger(__name__)
+
+# Pre-encoded response fragment (result or error member) and its latency
+_Reply = Tuple[bytes, float]
+
+
+def _encode(value: Any) -> bytes:
+    return json.dumps(value, separators=(",", ":")).encode()
+
+
+class _TcpServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class JsonRpcMockServer:
+    """Local json rpc server answering from recorded traffic, or with synthetic results generated from a schema.
+
+    Recorded responses are matched on method and params, then on method only, and cycle when a call was recorded
+    several times. Methods never recorded get a result generated from their schema `returns` definition.
+    Responses are delayed by their recorded latency multiplied by `latency_scale`, 0 answering as fast as possible.
+    The server speaks json rpc over http (the schema being served on get requests), and over tcp with one json
+    message per line. Both support batches.
+    """
+
+    MAX_DEPTH = 8
+
+    def __init__(
+        self,
+        recordings: Iterable[str] = (),
+        schema: Optional[Dict[str, Any]] = None,
+        latency_scale: float = 0.0,
+    ) -> None:
+        self._schema = schema or {}
+        self._latency_scale = latency_scale
+        self._by_params: Dict[str, Iterator[_Reply]] = {}
+        self._by_method: Dict[str, _Reply] = {}
+        self._servers: List[socketserver.BaseServer] = []
+
+        recorded: Dict[str, List[_Reply]] = {}
+        for path in recordings:
+            for entry in read_recordings(path):
+                reply = self._recorded_reply(entry)
+                method = entry[TrafficRecorder.KEY_METHOD]
+                recorded.setdefault(self._key(method, entry.get(TrafficRecorder.KEY_PARAMS)), []).append(reply)
+                self._by_method.setdefault(method, reply)
+        self._by_params = {key: itertools.cycle(replies) for key, replies in recorded.items()}
+
+        for method, props in self._schema.get("methods", {}).items():
+            if method not in self._by_method:
+                result = self.synthetic_value(props.get("returns") or {})
+                self._by_method[method] = (b'"result":' + _encode(result), 0.0)
+
+    def _key(self, method: str, params: Any) -> str:
+        return json.dumps([method, params or {}], sort_keys=True, separators=(",", ":"))
+
+    def _recorded_reply(self, entry: Dict[str, Any]) -> _Reply:
+        if TrafficRecorder.KEY_ERROR in entry:
+            fragment = b'"error":' + _encode(entry[TrafficRecorder.KEY_ERROR])
+        else:
+            fragment = b'"result":' + _encode(entry.get(TrafficRecorder.KEY_RESULT))
+        return fragment, entry.get(TrafficRecorder.KEY_ELAPSED, 0.0)
+
+    def synthetic_value(self, definition: Dict[str, Any], depth: int = 0) -> Any:
+        """Generate a value matching a json schema definition, resolving references in the schema types."""
+        if depth > self.MAX_DEPTH:
+            return None
+        if "$ref" in definition:
+            ref = self._schema.get("types", {}).get(definition["$ref"])
+            return self.synthetic_value(ref, depth + 1) if ref else None
+        if "default" in definition:
+            return definition["default"]
+        if definition.get("enum"):
+            return definition["enum"][0]
+
+        def_type = definition.get("type")
+        if isinstance(def_type, list):
+            def_type = def_type[0] if def_type else None
+        if isinstance(def_type, dict):
+            return self.synthetic_value(def_type, depth + 1)
+        if def_type == "object" or "properties" in definition:
+            return {
+                name: self.synthetic_value(prop, depth + 1) for name, prop in definition.get("properties", {}).items()
+            }
+        if def_type == "array":
+            items = definition.get("items", {})
+            return [self.synthetic_value(items if isinstance(items, dict) else {}, depth + 1)]
+        return {"string": "", "integer": 0, "number": 0.0, "boolean": False}.get(str(def_type))
+
+    def _error(self, req_id: Any, code: int, message: str) -> bytes:
+        error = {JsonRpcClient.JSONRPC_KEY_RESP_ERROR_CODE: code, JsonRpcClient.JSONRPC_KEY_RESP_ERROR_MSG: message}
+        return b'{"jsonrpc":"2.0","id":%s,"error":%s}' % (_encode(req_id), _encode(error))
+
+    def _respond(self, request: Any) -> Optional[bytes]:
+        if not isinstance(request, dict) or not isinstance(request.get(JsonRpcClient.JSONRPC_KEY_REQ_METHOD), str):
+            return self._error(None, JsonRpcClient.JSONRPC_INVALID_REQUEST, "Invalid Request")
+
+        method = request[JsonRpcClient.JSONRPC_KEY_REQ_METHOD]
+        key = self._key(method, request.get(JsonRpcClient.JSONRPC_KEY_REQ_PARAMS))
+        replies = self._by_params.get(key)
+        reply = next(replies) if replies else self._by_method.get(method)
+
+        # Notifications get no response
+        if JsonRpcClient.JSONRPC_KEY_ID not in request:
+            return None
+        req_id = request[JsonRpcClient.JSONRPC_KEY_ID]
+        if reply is None:
+            return self._error(req_id, JsonRpcClient.JSONRPC_METHOD_NOT_FOUND, "Method not found")
+
+        fragment, elapsed = reply
+        if self._latency_scale and elapsed:
+            time.sleep(elapsed * self._latency_scale)
+        return b'{"jsonrpc":"2.0","id":%s,%s}' % (_encode(req_id), fragment)
+
+    def handle(self, body: bytes) -> Optional[bytes]:
+        """Process a json rpc message or batch, returns the response to send if any."""
+        try:
+            message = json.loads(body)
+        except ValueError:
+            return self._error(None, JsonRpcClient.JSONRPC_PARSE_ERROR, "Parse error")
+
+        if isinstance(message, list):
+            if not message:
+                return self._error(None, JsonRpcClient.JSONRPC_INVALID_REQUEST, "Invalid Request")
+            responses = [resp for resp in (self._respond(request) for request in message) if resp is not None]
+            return b"[" + b",".join(responses) + b"]" if responses else None
+        return self._respond(message)
+
+    def _http_handler(self) -> type:
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                log.debug(format % args)
+
+            def _read_body(self) -> bytes:
+                if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+                    chunks: List[bytes] = []
+                    while True:
+                        size = int(self.rfile.readline().split(b";")[0], 16)
+                        if size == 0:
+                            self.rfile.readline()
+                            return b"".join(chunks)
+                        chunks.append(self.rfile.read(size))
+                        self.rfile.readline()
+                return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+            def _send(self, code: int, body: bytes) -> None:
+                self.send_response(code)
+                self.send_header("Content-Type", JsonRpcClient.JSONRPC_CONTENT)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if mock._schema:
+                    self._send(200, _encode(mock._schema))
+                else:
+                    self._send(404, b"")
+
+            def do_POST(self):
+                response = mock.handle(self._read_body())
+                self._send(200 if response else 204, response or b"")
+
+        return Handler
+
+    def _tcp_handler(self) -> type:
+        mock = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    if line.strip():
+                        response = mock.handle(line)
+                        if response:
+                            self.wfile.write(response + b"\n")
+
+        return Handler
+
+    def _start(self, server: socketserver.BaseServer) -> socketserver.BaseServer:
+        self._servers.append(server)
+        threading.Thread(target=server.serve_forever, name="pysonrpc-mock", daemon=True).start()
+        return server
+
+    def serve_http(self, host: str = "127.0.0.1", port: int = 8080) -> socketserver.BaseServer:
+        """Start serving over http in a background thread, port 0 picking a free port."""
+        server = ThreadingHTTPServer((host, port), self._http_handler())
+        server.daemon_threads = True
+        log.info(f"Serving json rpc over http on {host}:{server.server_address[1]}")
+        return self._start(server)
+
+    def serve_tcp(self, host: str = "127.0.0.1", port: int = 9090) -> socketserver.BaseServer:
+        """Start serving over tcp in a background thread, port 0 picking a free port."""
+        server = _TcpServer((host, port), self._tcp_handler())
+        log.info(f"Serving json rpc over tcp on {host}:{server.server_address[1]}")
+        return self._start(server)
+
+    def shutdown(self) -> None:
+        for server in self._servers:
+            server.shutdown()
+            server.server_close()
+        self._servers = []
@@ -0,0 +1,67 @@
+import json
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Callable, Optional, Tuple, Union
+
+from pysonrpc.jsonrpc import JsonRpcClient
+
+# Response body, either as is or as the name and size of the shared memory block holding it
+_Body = Union[bytes, Tuple[str, int]]
+
+
+def _decode_response(body: _Body, transform: Optional[Callable[[Any], Any]]) -> Any:
+    """Worker side: decode a json rpc response, extract its result and transform it."""
+    if isinstance(body, tuple):
+        name, size = body
+        shm = SharedMemory(name=name)
+        try:
+            # Decode straight from the shared buffer, without copying it to bytes first
+            text = str(shm.buf[:size], "utf-8")  # type: ignore[index]
+        finally:
+            shm.close()
+    else:
+        text = body.decode("utf-8")
+
+    result = JsonRpcClient.jsonrpc_result(json.loads(text))
+    return transform(result) if transform else result
+
+
+class ProcessDecoder:
+    """Decodes raw json rpc responses and applies a transform to their result in a pool of processes.
+
+    This offloads the json parsing and post-processing of large results from the calling process, where they are
+    serialized by the GIL. Bodies of `shm_threshold` bytes or more are handed to workers through shared memory rather
+    than pickled. The transform must be picklable (e.g a module level function), as well as its results.
+    """
+
+    def __init__(self, processes: Optional[int] = None, shm_threshold: int = 1 << 20) -> None:
+        self._pool = ProcessPoolExecutor(processes)
+        self._shm_threshold = shm_threshold
+
+    def submit(self, body: bytes, transform: Optional[Callable[[Any], Any]] = None) -> Future:
+        """Schedule the decoding of a response body, returns the future of the transformed result."""
+        if len(body) < self._shm_threshold:
+            return self._pool.submit(_decode_response, body, transform)
+
+        shm = SharedMemory(create=True, size=len(body))
+        try:
+            shm.buf[: len(body)] = body  # type: ignore[index]
+            future = self._pool.submit(_decode_response, (shm.name, len(body)), transform)
+        except BaseException:
+            self._release(shm)
+            raise
+        future.add_done_callback(lambda _: self._release(shm))
+        return future
+
+    def _release(self, shm: SharedMemory) -> None:
+        shm.close()
+        shm.unlink()
+
+    def close(self) -> None:
+        self._pool.shutdown()
+
+    def __enter__(self) -> "ProcessDecoder":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
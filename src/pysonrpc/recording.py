@@ -0,0 +1,49 @@
+import json
+import threading
+from typing import Any, Dict, Iterator, Optional
+
+
+class TrafficRecorder:
+    """Records json rpc calls and their responses to a NDJSON file, one call per line.
+
+    Each line holds the method, params, result or error, and the call duration in seconds ("elapsed").
+    """
+
+    KEY_METHOD = "method"
+    KEY_PARAMS = "params"
+    KEY_RESULT = "result"
+    KEY_ERROR = "error"
+    KEY_ELAPSED = "elapsed"
+
+    def __init__(self, path: str, append: bool = True) -> None:
+        self._path = path
+        self._fp = open(path, "a" if append else "w")
+        self._lock = threading.Lock()
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    def record(self, method: str, params: Any, response: Dict[str, Any], elapsed: float) -> None:
+        entry = {self.KEY_METHOD: method, self.KEY_PARAMS: params, self.KEY_ELAPSED: round(elapsed, 6)}
+        for key in (self.KEY_RESULT, self.KEY_ERROR):
+            if key in response:
+                entry[key] = response[key]
+        line = json.dumps(entry, separators=(",", ":"), default=str)
+        with self._lock:
+            self._fp.write(line + "\n")
+            self._fp.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            self._fp.close()
+
+
+def read_recordings(path: str, method: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """Read back the calls recorded in a file, optionally only the ones of a method."""
+    with open(path, "r") as fp:
+        for line in fp:
+            if line.strip():
+                entry = json.loads(line)
+                if method is None or entry.get(TrafficRecorder.KEY_METHOD) == method:
+                    yield entry
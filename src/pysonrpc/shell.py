@@ -0,0 +1,148 @@
+import cmd
+import json
+import shlex
+import time
+from typing import IO, Any, Dict, List, Optional
+
+from prettytable import PrettyTable
+
+from pysonrpc.jsonrpc import JsonRpcEndpoint, JsonRpcError, Method
+
+
+class JsonRpcShell(cmd.Cmd):
+    """Interactive shell running methods on an endpoint connected once.
+
+    Methods are run with `run <method> [params]` or directly with `<method> [params]`, params being either a json
+    object or `name=value` pairs (values being parsed as json if possible). Namespaces, methods and params names are
+    completed from the schema, and each call is timed.
+    """
+
+    intro = "Type help or ? to list commands, tab to complete methods and params."
+    prompt = "pysonrpc> "
+
+    def __init__(
+        self, endpoint: JsonRpcEndpoint, stdin: Optional[IO[str]] = None, stdout: Optional[IO[str]] = None
+    ) -> None:
+        super().__init__(stdin=stdin, stdout=stdout)
+        if stdin:
+            self.use_rawinput = False
+        self._endpoint = endpoint
+        self._raw = False
+
+    def _print(self, message: Any) -> None:
+        self.stdout.write(f"{message}\n")
+
+    def _parse_params(self, arg: str) -> Dict[str, Any]:
+        if arg.startswith("{"):
+            return json.loads(arg)
+        params = {}
+        for param in shlex.split(arg):
+            name, sep, value = param.partition("=")
+            if not sep:
+                raise ValueError(f"Invalid parameter '{param}', expected name=value")
+            try:
+                params[name] = json.loads(value)
+            except ValueError:
+                params[name] = value
+        return params
+
+    def _complete_method(self, text: str) -> List[str]:
+        """Complete method names one namespace at a time."""
+        names = set()
+        for fullname in self._endpoint.methods:
+            if fullname.startswith(text):
+                sep = fullname.find(Method.NAMESPACE_SEP, len(text))
+                names.add(fullname if sep < 0 else fullname[: sep + 1])
+        return sorted(names)
+
+    def _complete_params(self, method_name: str, text: str, line: str) -> List[str]:
+        method = self._endpoint.methods.get(method_name)
+        if not method:
+            return []
+        used = {arg.partition("=")[0] for arg in line.split()}
+        return [f"{name}=" for name in method.param_list() if name and name.startswith(text) and name not in used]
+
+    def completenames(self, text, *ignored) -> List[str]:
+        return super().completenames(text, *ignored) + self._complete_method(text)
+
+    def completedefault(self, text, line, begidx, endidx) -> List[str]:
+        return self._complete_params(line.split()[0], text, line)
+
+    def complete_run(self, text, line, begidx, endidx) -> List[str]:
+        args = line[:begidx].split()
+        if len(args) < 2:
+            return self._complete_method(text)
+        return self._complete_params(args[1], text, line)
+
+    def complete_list(self, text, line, begidx, endidx) -> List[str]:
+        return self._complete_method(text)
+
+    def cmdloop(self, intro: Optional[Any] = None) -> None:
+        """Run the shell until exited, a Ctrl-C at the prompt only discarding the line being typed."""
+        while True:
+            try:
+                super().cmdloop(intro)
+                return
+            except KeyboardInterrupt:
+                self._print("^C")
+                intro = ""
+
+    def emptyline(self) -> bool:
+        return False
+
+    def default(self, line: str) -> None:
+        self.do_run(line)
+
+    def do_run(self, arg: str) -> bool:
+        """run <method> [json params | name=value ...]: run a method, e.g run VideoLibrary.GetMovieDetails movieid=1"""
+        try:
+            method, _, params_arg = arg.strip().partition(" ")
+            if not method:
+                raise ValueError("Method name required")
+            params = self._parse_params(params_arg.strip())
+            start = time.monotonic()
+            # Params are passed as is rather than as keywords, they can be named like run_method arguments
+            result = self._endpoint.client.request(method, params, raw=self._raw)
+            known_method = self._endpoint.methods.get(method)
+            if known_method and not self._raw:
+                result = known_method.decode(result)
+            elapsed = time.monotonic() - start
+        except (JsonRpcError, ValueError) as e:
+            self._print(f"Error: {e}")
+            return False
+        except KeyboardInterrupt:
+            # Only interrupt the call, not the session
+            self._print("Interrupted")
+            return False
+        self._print(json.dumps(result, indent=2, default=repr))
+        self._print(f"({elapsed * 1000:.1f} ms)")
+        return False
+
+    def do_list(self, arg: str) -> bool:
+        """list [filter]: list methods, optionally only the ones containing filter"""
+        tab = PrettyTable(["Method", "Parameters"])
+        tab.align = "l"
+        for method in self._endpoint.methods.values():
+            if arg.strip() in method.fullname:
+                tab.add_row([method.fullname, method.param_list()])
+        self._print(tab)
+        return False
+
+    def do_describe(self, arg: str) -> bool:
+        """describe <method>: show the full description of a method"""
+        method = self._endpoint.methods.get(arg.strip())
+        self._print(json.dumps(method.properties, indent=2) if method else f"Unknown method {arg}")
+        return False
+
+    def do_raw(self, arg: str) -> bool:
+        """raw [on|off]: show full json rpc responses rather than results"""
+        self._raw = arg.strip().lower() != "off"
+        self._print(f"Raw responses {'on' if self._raw else 'off'}")
+        return False
+
+    def do_exit(self, arg: str) -> bool:
+        """exit: leave the shell"""
+        return True
+
+    do_quit = do_exit
+    do_EOF = do_exit
@@ -0,0 +1,98 @@
+import base64
+import json
+from typing import Any, Callable, Dict, Iterable, Iterator
+
+_encode_json = json.JSONEncoder(separators=(",", ":"), allow_nan=False).encode
+
+
+class Stream:
+    """Marks a param value to be streamed rather than encoded at once.
+
+    The value is either a file-like object, sent as a json string (base64 encoded if it reads bytes), or an iterable
+    such as a generator, sent as a json array. Items of a streamed iterable can hold streams as well.
+    """
+
+    __slots__ = ("value",)
+    # Stable representation of streamed values, e.g in recordings
+    PLACEHOLDER = "<stream>"
+
+    def __init__(self, value: Any) -> None:
+        self.value = value
+
+    def __repr__(self) -> str:
+        return self.PLACEHOLDER
+
+
+def has_streams(params: Any) -> bool:
+    """Check if params hold top-level streamed values."""
+    return type(params) is dict and Stream in map(type, params.values())
+
+
+def _iter_file(fp: Any, chunk_size: int) -> Iterator[bytes]:
+    """Encode a file content as a json string, binary content being base64 encoded."""
+    yield b'"'
+    carry = b""
+    while True:
+        chunk = fp.read(chunk_size)
+        if not chunk:
+            break
+        if isinstance(chunk, str):
+            yield _encode_json(chunk)[1:-1].encode()
+        else:
+            # Base64 encode whole 3 bytes groups only, so that the encoded chunks can be concatenated
+            chunk = carry + chunk
+            cut = len(chunk) - len(chunk) % 3
+            carry = chunk[cut:]
+            yield base64.b64encode(chunk[:cut])
+    if carry:
+        yield base64.b64encode(carry)
+    yield b'"'
+
+
+def _iter_items(items: Iterable[Any], encode_item: Callable[[Any], Iterator[bytes]]) -> Iterator[bytes]:
+    for index, item in enumerate(items):
+        if index:
+            yield b","
+        yield from encode_item(item)
+
+
+def _iter_member(name: Any, value: Any, chunk_size: int) -> Iterator[bytes]:
+    yield _encode_json(str(name)).encode() + b":"
+    yield from iter_json(value, chunk_size)
+
+
+def _iter_dict(value: Dict[Any, Any], chunk_size: int) -> Iterator[bytes]:
+    yield b"{"
+    yield from _iter_items(value.items(), lambda item: _iter_member(item[0], item[1], chunk_size))
+    yield b"}"
+
+
+def iter_json(value: Any, chunk_size: int) -> Iterator[bytes]:
+    """Encode a value as json piece by piece, streamed values being read or iterated as they are encoded.
+
+    Only the members of dicts (params or items of a streamed iterable) are looked at for streamed values.
+    """
+    if type(value) is Stream:
+        stream = value.value
+        if hasattr(stream, "read"):
+            yield from _iter_file(stream, chunk_size)
+        else:
+            yield b"["
+            yield from _iter_items(stream, lambda item: iter_json(item, chunk_size))
+            yield b"]"
+    elif has_streams(value):
+        yield from _iter_dict(value, chunk_size)
+    else:
+        yield _encode_json(value).encode()
+
+
+def iter_payload(prefix: bytes, params: Any, suffix: bytes, chunk_size: int) -> Iterator[bytes]:
+    """Encode a payload with streamed params, in chunks of about chunk_size bytes."""
+    buffer = bytearray(prefix)
+    for piece in iter_json(params, chunk_size):
+        buffer += piece
+        if len(buffer) >= chunk_size:
+            yield bytes(buffer)
+            buffer.clear()
+    buffer += suffix
+    yield bytes(buffer)
@@ -0,0 +1,123 @@
+import keyword
+import re
+import threading
+from dataclasses import make_dataclass
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from pysonrpc.jsonrpc import JsonRpcClientError
+
+# Generated class, and its mapping from json property names to attribute names and property definitions
+_TypeInfo = Tuple[type, Dict[str, Tuple[str, Dict[str, Any]]]]
+
+
+class ResultDecoder:
+    """Decodes json results into compact slotted dataclasses generated from the schema definitions.
+
+    A class is generated and cached per schema type (`$ref`), or per anonymous object definition, with an attribute
+    per defined property (invalid identifiers being sanitized, e.g "3d" becoming "_3d", and numbered on collisions,
+    e.g "a-b" and "a_b" becoming "a_b" and "a_b_2"). Properties not defined in the schema are dropped, or kept in an
+    `_extra` dict attribute if `unknown` is set to `UNKNOWN_KEEP`.
+    """
+
+    UNKNOWN_DROP = "drop"
+    UNKNOWN_KEEP = "keep"
+    EXTRA_ATTR = "_extra"
+    MAX_DEPTH = 32
+
+    def __init__(self, types: Optional[Dict[str, Any]] = None, unknown: str = UNKNOWN_DROP) -> None:
+        if unknown not in (self.UNKNOWN_DROP, self.UNKNOWN_KEEP):
+            raise JsonRpcClientError(f"Unknown fields setting must be {self.UNKNOWN_DROP} or {self.UNKNOWN_KEEP}")
+        self._types = types if types is not None else {}
+        self._keep_unknown = unknown == self.UNKNOWN_KEEP
+        self._classes: Dict[Any, _TypeInfo] = {}
+        self._anonymous: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    @property
+    def types(self) -> Dict[str, Any]:
+        return self._types
+
+    def _attr_name(self, name: str, used: Set[str]) -> str:
+        """Sanitize a property name into an attribute name not already used, and mark it as used."""
+        attr = re.sub(r"\W", "_", name)
+        if not attr.isidentifier() or keyword.iskeyword(attr):
+            attr = f"_{attr}"
+        unique = attr
+        index = 2
+        while unique in used or unique == self.EXTRA_ATTR:
+            unique = f"{attr}_{index}"
+            index += 1
+        used.add(unique)
+        return unique
+
+    def _class_name(self, name: str) -> str:
+        return "".join(part[:1].upper() + part[1:] for part in re.split(r"\W+", name) if part) or "Result"
+
+    def _resolve(self, definition: Dict[str, Any], depth: int = 0) -> Tuple[Optional[str], Dict[str, Any]]:
+        """Follow references, returns the type name if any and the actual definition."""
+        name = None
+        while "$ref" in definition and depth < self.MAX_DEPTH:
+            name = definition["$ref"]
+            definition = self._types.get(name, {})
+            depth += 1
+        return name, definition
+
+    def _properties(self, definition: Dict[str, Any], depth: int = 0) -> Dict[str, Any]:
+        """Get the properties of an object definition, including the ones of the types it extends."""
+        properties: Dict[str, Any] = {}
+        extends = definition.get("extends") or []
+        for base in [extends] if isinstance(extends, str) else extends:
+            if depth < self.MAX_DEPTH:
+                properties.update(self._properties(self._resolve({"$ref": base})[1], depth + 1))
+        properties.update(definition.get("properties", {}))
+        return properties
+
+    def _class_for(self, name: Optional[str], definition: Dict[str, Any]) -> _TypeInfo:
+        key = name or id(definition)
+        info = self._classes.get(key)
+        if info is None:
+            with self._lock:
+                info = self._classes.get(key)
+                if info is None:
+                    used: Set[str] = set()
+                    mapping = {
+                        prop: (self._attr_name(prop, used), prop_def)
+                        for prop, prop_def in self._properties(definition).items()
+                    }
+                    fields: List[Any] = [(attr, Any, None) for attr, _ in mapping.values()]
+                    if self._keep_unknown:
+                        fields.append((self.EXTRA_ATTR, Dict[str, Any], None))
+                    cls = make_dataclass(self._class_name(name or "Result"), fields, slots=True)
+                    info = self._classes[key] = (cls, mapping)
+                    if not name:
+                        # Anonymous definitions are cached by id, keep them alive so that their id stays unique
+                        self._anonymous.append(definition)
+        return info
+
+    def decode(self, definition: Optional[Dict[str, Any]], value: Any, depth: int = 0) -> Any:
+        """Decode a json value according to its schema definition, values without definition are returned as is."""
+        if not definition or value is None or depth > self.MAX_DEPTH:
+            return value
+        name, definition = self._resolve(definition)
+
+        if isinstance(value, list):
+            items = definition.get("items")
+            if isinstance(items, dict):
+                return [self.decode(items, item, depth + 1) for item in value]
+            return value
+
+        if isinstance(value, dict) and (definition.get("properties") or definition.get("extends")):
+            cls, mapping = self._class_for(name, definition)
+            attrs = {}
+            extra = {}
+            for prop, prop_value in value.items():
+                prop_info = mapping.get(prop)
+                if prop_info:
+                    attrs[prop_info[0]] = self.decode(prop_info[1], prop_value, depth + 1)
+                elif self._keep_unknown:
+                    extra[prop] = prop_value
+            if extra:
+                attrs[self.EXTRA_ATTR] = extra
+            return cls(**attrs)
+
+        return value
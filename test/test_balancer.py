@@ -0,0 +1,136 @@
+import pytest
+import time
+from unittest.mock import ANY, call, patch, Mock
+from pysonrpc.balancer import JsonRpcBalancedClient
+from pysonrpc.jsonrpc import JsonRpcClient, JsonRpcEndpoint, JsonRpcClientError, JsonRpcServerError
+
+TEST_URLS = ["http://127.0.0.1:8080/path", "http://127.0.0.2:8080/path", "http://127.0.0.3:8080/path"]
+TEST_HEADERS = {'Content-Type': 'application/json'}
+TEST_SCHEMA = {"methods": {"some.method": {}}}
+
+
+def mock_response(code, data_dict):
+    resp = Mock()
+    resp.status_code = code
+    resp.json.side_effect = data_dict
+    return resp
+
+
+def post_by_url(responses):
+    """Answer posts with the response registered for the url, raising it if it's an exception."""
+    def post(url, **kwargs):
+        resp = responses[url]
+        if isinstance(resp, Exception):
+            raise resp
+        return mock_response(resp, [{"result": url}])
+    return post
+
+
+def test_balancer_invalid():
+    with pytest.raises(JsonRpcClientError):
+        JsonRpcBalancedClient([])
+    with pytest.raises(JsonRpcClientError):
+        JsonRpcBalancedClient(TEST_URLS, policy="bad")
+
+
+@patch("pysonrpc.jsonrpc.requests.get")
+@patch("pysonrpc.jsonrpc.requests.post")
+def test_endpoint_replicas(mock_post, mock_get):
+    mock_get.return_value = mock_response(200, [TEST_SCHEMA])
+    mock_post.side_effect = post_by_url({url: 200 for url in TEST_URLS})
+    cli = JsonRpcEndpoint(TEST_URLS, auto_detect=True)
+
+    assert isinstance(cli.client, JsonRpcBalancedClient)
+    # Schema discovered once only
+    mock_get.assert_called_once_with(ANY, headers=TEST_HEADERS, auth=None)
+    assert list(cli.methods.keys()) == ["some.method"]
+
+    results = {cli.some.method(raw=False) for _ in range(30)}
+    assert results == set(TEST_URLS)
+    assert sum(stats["requests"] for stats in cli.client.stats().values()) == 31
+
+
+@pytest.mark.parametrize("policy", [JsonRpcBalancedClient.POLICY_LEAST_OUTSTANDING, JsonRpcBalancedClient.POLICY_EWMA])
+def test_balancer_select(policy):
+    client = JsonRpcBalancedClient(TEST_URLS, policy=policy)
+    for replica, (outstanding, latency) in zip(client.replicas, [(2, 0.1), (1, 0.5), (3, 0.01)]):
+        replica.outstanding = outstanding
+        replica.latency = latency
+
+    expected = client.replicas[1] if policy == JsonRpcBalancedClient.POLICY_LEAST_OUTSTANDING else client.replicas[2]
+    assert client._select() is expected
+
+    # Ejected replicas are skipped
+    expected.ejected_until = float("inf")
+    assert client._select() is not expected
+
+    # All ejected, still routes somewhere
+    for replica in client.replicas:
+        replica.ejected_until = float("inf")
+    assert client._select() in client.replicas
+
+
+@patch("pysonrpc.jsonrpc.requests.post")
+def test_balancer_ejection(mock_post):
+    responses = {TEST_URLS[0]: Exception("down"), TEST_URLS[1]: 200, TEST_URLS[2]: 503}
+    mock_post.side_effect = post_by_url(responses)
+    client = JsonRpcBalancedClient(TEST_URLS, max_failures=2, eject_time=1000)
+
+    for _ in range(20):
+        try:
+            client.request("some.method", raw=False)
+        except (JsonRpcClientError, JsonRpcServerError):
+            pass
+
+    stats = client.stats()
+    assert stats[TEST_URLS[0]]["ejected"] and stats[TEST_URLS[0]]["errors"] == 2
+    assert stats[TEST_URLS[2]]["ejected"] and stats[TEST_URLS[2]]["errors"] == 2
+    assert not stats[TEST_URLS[1]]["ejected"] and stats[TEST_URLS[1]]["requests"] == 16
+
+    # Replica came back, probes re-admit it
+    responses[TEST_URLS[0]] = 200
+    client._probe_method = "JSONRPC.Ping"
+    client.probe()
+    stats = client.stats()
+    assert not stats[TEST_URLS[0]]["ejected"]
+    assert stats[TEST_URLS[2]]["ejected"]
+    assert client.request("some.method", raw=False) in TEST_URLS[:2]
+
+
+@patch("pysonrpc.jsonrpc.requests.get")
+def test_balancer_probing(mock_get):
+    mock_get.return_value = mock_response(200, [])
+    client = JsonRpcBalancedClient(TEST_URLS, probe_interval=0.01)
+    client.replicas[0].ejected_until = float("inf")
+    try:
+        for _ in range(100):
+            if not client.stats()[TEST_URLS[0]]["ejected"]:
+                break
+            time.sleep(0.01)
+    finally:
+        client.close()
+    assert not client.stats()[TEST_URLS[0]]["ejected"]
+    mock_get.assert_any_call(TEST_URLS[0], headers=TEST_HEADERS, auth=None, timeout=5.0)
+
+
+@patch("pysonrpc.jsonrpc.requests.post")
+def test_balancer_probe_failures(mock_post):
+    client = JsonRpcBalancedClient(TEST_URLS[:1], probe_method="JSONRPC.Ping", probe_timeout=2)
+    replica = client.replicas[0]
+    error = {"error": {"code": -32601, "message": "Method not found"}}
+    for response in [mock_response(415, [{}]), mock_response(200, [error]), Exception("timeout")]:
+        replica.ejected_until = 0.0
+        replica.failures = 0
+        mock_post.side_effect = None
+        mock_post.return_value = response
+        if isinstance(response, Exception):
+            mock_post.side_effect = response
+        for _ in range(3):
+            client.probe()
+        assert client.stats()[TEST_URLS[0]]["ejected"]
+
+    mock_post.side_effect = None
+    mock_post.return_value = mock_response(200, [{"result": "pong"}])
+    client.probe()
+    assert not client.stats()[TEST_URLS[0]]["ejected"]
+    mock_post.assert_called_with(TEST_URLS[0], data=ANY, headers=TEST_HEADERS, auth=None, timeout=2)
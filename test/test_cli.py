@@ -157,4 +157,87 @@ def test_cli_invalid_cli(mock_endpoint, debug, monkeypatch, mock_exit):
     mock_endpoint.side_effect = Exception()
 
     cli_main()
-    mock_exit.assert_called_with(2)
\ No newline at end of file
+    mock_exit.assert_called_with(2)
+
+@pytest.mark.parametrize("tcp", [True, False])
+@patch("pysonrpc.cli.threading.Event")
+@patch("pysonrpc.cli.JsonRpcMockServer")
+@patch("pysonrpc.cli.pysonrpc.JsonRpcEndpoint")
+def test_cli_serve_mock(mock_endpoint, mock_server, mock_event, tcp, monkeypatch, mock_exit):
+    test_args = [
+        "pysonrpc",
+        "serve-mock",
+        "-i", "rec1.ndjson",
+        "-i", "rec2.ndjson",
+        "-s", "test/methods.json",
+        "-P", "1234",
+        "-l", "0.5",
+    ]
+    if tcp:
+        test_args.extend(["-T", "4321"])
+    monkeypatch.setattr(sys, "argv", test_args)
+    mock_event().wait.side_effect = KeyboardInterrupt()
+
+    cli_main()
+    mock_endpoint.assert_not_called()
+    mock_server.assert_called_with(["rec1.ndjson", "rec2.ndjson"], schema=ANY, latency_scale=0.5)
+    assert "Some3.Method1" in mock_server.call_args.kwargs["schema"]["methods"]
+    mock_server().serve_http.assert_called_with("127.0.0.1", 1234)
+    if tcp:
+        mock_server().serve_tcp.assert_called_with("127.0.0.1", 4321)
+    else:
+        mock_server().serve_tcp.assert_not_called()
+    mock_server().shutdown.assert_called_once()
+    mock_exit.assert_called_with(0)
+
+
+def test_cli_missing_url(monkeypatch):
+    monkeypatch.setattr(sys, "argv", ["pysonrpc", "list"])
+    with pytest.raises(SystemExit):
+        cli_main()
+
+
+@patch("pysonrpc.cli.Exporter")
+@patch("pysonrpc.cli.pysonrpc.JsonRpcEndpoint")
+def test_cli_export(mock_endpoint, mock_exporter, monkeypatch, mock_exit):
+    test_args = [
+        "pysonrpc",
+        "-r", TEST_HOST,
+        "export",
+        "-m", "VideoLibrary.GetMovies",
+        "-m", "AudioLibrary.GetSongs",
+        "-p", '{"VideoLibrary.GetMovies": {"properties": ["title"]}}',
+        "-o", "out",
+        "-F", "csv",
+        "-z",
+        "-j", "8",
+        "-c", "progress.json",
+        "-P", "2",
+    ]
+    monkeypatch.setattr(sys, "argv", test_args)
+    mock_exporter.FORMAT_NDJSON = "ndjson"
+    mock_exporter.FORMAT_CSV = "csv"
+    mock_exporter().export.return_value = {"VideoLibrary.GetMovies": 10, "AudioLibrary.GetSongs": 2}
+
+    cli_main()
+    mock_exporter.assert_called_with(
+        mock_endpoint(), "out", fmt="csv", compress=True, page_size=500, parallelism=8, checkpoint="progress.json",
+        processes=2,
+    )
+    mock_exporter().export.assert_called_with(
+        ["VideoLibrary.GetMovies", "AudioLibrary.GetSongs"], {"VideoLibrary.GetMovies": {"properties": ["title"]}}
+    )
+    mock_exit.assert_called_with(0)
+
+
+@patch("pysonrpc.cli.JsonRpcShell")
+@patch("pysonrpc.cli.pysonrpc.JsonRpcEndpoint")
+def test_cli_shell(mock_endpoint, mock_shell, monkeypatch, mock_exit):
+    monkeypatch.setattr(sys, "argv", ["pysonrpc", "-r", TEST_HOST, "-a", "shell"])
+
+    cli_main()
+    mock_endpoint.assert_called_once()
+    assert mock_endpoint().client.session is not None
+    mock_shell.assert_called_with(mock_endpoint())
+    mock_shell().cmdloop.assert_called_once()
+    mock_exit.assert_called_with(0)
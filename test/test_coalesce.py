@@ -0,0 +1,106 @@
+import pytest
+import threading
+import time
+from unittest.mock import patch, Mock
+from pysonrpc.coalesce import RequestCoalescer
+from pysonrpc.jsonrpc import JsonRpcEndpoint, JsonRpcClientError
+
+TEST_URL = "http://127.0.0.1:8080/path"
+
+
+def slow_post(started, release, result="data"):
+    """Post mock blocking until released, to get concurrent calls in flight."""
+    def post(*args, **kwargs):
+        started.set()
+        release.wait(5)
+        resp = Mock()
+        resp.status_code = 200
+        resp.json.return_value = {"result": result}
+        return resp
+    return post
+
+
+def run_concurrently(func, count):
+    results = [None] * count
+
+    def target(i):
+        try:
+            results[i] = func()
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=target, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads, results
+
+
+def wait_for(condition, timeout=5):
+    """Poll a condition rather than sleeping a fixed time, to stay reliable on loaded machines."""
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert condition()
+
+
+def test_coalescer_key():
+    coalescer = RequestCoalescer(["Some.Method"])
+    assert coalescer.key("Other.Method", {}) is None
+    assert coalescer.key("Some.Method", {"a": 1, "b": [1, 2]}) == coalescer.key("Some.Method", {"b": [1, 2], "a": 1})
+    assert coalescer.key("Some.Method", {"a": 1}) != coalescer.key("Some.Method", {"a": 2})
+    assert coalescer.key("Some.Method", {"a": object()}) is None
+
+
+@pytest.mark.parametrize("coalesce, expected_posts", [(True, 1), (["VideoLibrary.GetMovieDetails"], 1), (False, 8)])
+@patch("pysonrpc.jsonrpc.requests.post")
+def test_coalesce_requests(mock_post, coalesce, expected_posts):
+    started, release = threading.Event(), threading.Event()
+    mock_post.side_effect = slow_post(started, release)
+    cli = JsonRpcEndpoint(TEST_URL, coalesce=coalesce)
+
+    threads, results = run_concurrently(lambda: cli.run_method("VideoLibrary.GetMovieDetails", movieid=1, raw=False), 8)
+    started.wait(5)
+    # Wait for all threads to join the flight
+    if coalesce:
+        wait_for(lambda: cli.client.coalescer.stats()["calls"] == 8)
+    else:
+        wait_for(lambda: mock_post.call_count == 8)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert results == ["data"] * 8
+    assert mock_post.call_count == expected_posts
+    if coalesce:
+        assert cli.client.coalescer.stats() == {"calls": 8, "coalesced": 7, "in_flight": 0}
+    else:
+        assert cli.client.coalescer is None
+
+
+@patch("pysonrpc.jsonrpc.requests.post")
+def test_coalesce_errors(mock_post):
+    started, release = threading.Event(), threading.Event()
+    post = slow_post(started, release)
+
+    def failing_post(*args, **kwargs):
+        post()
+        raise Exception("error")
+
+    mock_post.side_effect = failing_post
+    cli = JsonRpcEndpoint(TEST_URL, coalesce=True)
+
+    threads, results = run_concurrently(lambda: cli.run_method("Some.Method"), 4)
+    started.wait(5)
+    wait_for(lambda: cli.client.coalescer.stats()["calls"] == 4)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert all(isinstance(result, JsonRpcClientError) for result in results)
+    assert mock_post.call_count == 1
+
+    # Explicit ids are never coalesced, and nothing is left in flight
+    mock_post.side_effect = None
+    mock_post.return_value = Mock(status_code=200, json=Mock(return_value={"result": "data"}))
+    assert cli.client.request("Some.Method", req_id=12, raw=False) == "data"
+    assert cli.client.coalescer.stats() == {"calls": 4, "coalesced": 3, "in_flight": 0}
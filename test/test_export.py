@@ -0,0 +1,134 @@
+import pytest
+import csv
+import gzip
+import json
+from unittest.mock import patch, Mock
+from pysonrpc.export import Exporter
+from pysonrpc.jsonrpc import JsonRpcEndpoint, JsonRpcClientError
+
+TEST_URL = "http://127.0.0.1:8080/path"
+TEST_MOVIES = [{"movieid": i, "title": f"movie {i}", "genre": ["a", "b"]} for i in range(23)]
+TEST_SONGS = [{"songid": i} for i in range(7)]
+
+
+class FakeServer:
+    """Answers paged requests, optionally failing on a page start."""
+
+    def __init__(self, fail_at=None, cap=None):
+        self.fail_at = fail_at
+        self.cap = cap
+        self.requests = []
+
+    def request(self, method, params, raw):
+        start, end = params["limits"]["start"], params["limits"]["end"]
+        self.requests.append((method, start))
+        if start == self.fail_at:
+            raise JsonRpcClientError("error")
+        if self.cap:
+            end = min(end, start + self.cap)
+        if method == "Some.List":
+            return ["a", "b"]
+        collection, key = (TEST_MOVIES, "movies") if method == "VideoLibrary.GetMovies" else (TEST_SONGS, "songs")
+        return {key: collection[start:end], "limits": {"start": start, "end": end, "total": len(collection)}}
+
+
+def read_ndjson(path, compress=False):
+    with (gzip.open(path, "rt") if compress else open(path)) as fp:
+        return [json.loads(line) for line in fp]
+
+
+def fake_endpoint(server):
+    cli = JsonRpcEndpoint(TEST_URL)
+    cli.client = Mock()
+    cli.client.request.side_effect = server.request
+    cli.client.request_bytes.side_effect = lambda method, params: json.dumps(
+        {"result": server.request(method, params, raw=False)}
+    ).encode()
+    return cli
+
+
+def test_export_invalid(tmp_path):
+    with pytest.raises(JsonRpcClientError):
+        Exporter(JsonRpcEndpoint(TEST_URL), str(tmp_path), fmt="xml")
+
+
+@pytest.mark.parametrize("compress", [True, False])
+@pytest.mark.parametrize("parallelism", [1, 4])
+def test_export_ndjson(tmp_path, compress, parallelism):
+    server = FakeServer()
+    exporter = Exporter(fake_endpoint(server), str(tmp_path / "out"), compress=compress, page_size=5, parallelism=parallelism)
+    counts = exporter.export(["VideoLibrary.GetMovies", "AudioLibrary.GetSongs", "Some.List"])
+
+    assert counts == {"VideoLibrary.GetMovies": 23, "AudioLibrary.GetSongs": 7, "Some.List": 2}
+    assert read_ndjson(exporter.output_path("VideoLibrary.GetMovies"), compress) == TEST_MOVIES
+    assert read_ndjson(exporter.output_path("AudioLibrary.GetSongs"), compress) == TEST_SONGS
+    assert read_ndjson(exporter.output_path("Some.List"), compress) == ["a", "b"]
+    assert exporter.output_path("Some.List").endswith(".ndjson.gz" if compress else ".ndjson")
+    assert sorted(start for method, start in server.requests if method == "VideoLibrary.GetMovies") == [0, 5, 10, 15, 20]
+
+
+def test_export_csv_resume(tmp_path):
+    checkpoint = str(tmp_path / "checkpoint.json")
+    server = FakeServer(fail_at=15)
+    exporter = Exporter(fake_endpoint(server), str(tmp_path), fmt="csv", page_size=5, checkpoint=checkpoint)
+    extra_params = {"VideoLibrary.GetMovies": {"properties": ["title"]}}
+    with pytest.raises(JsonRpcClientError):
+        exporter.export(["VideoLibrary.GetMovies", "AudioLibrary.GetSongs"], extra_params)
+
+    with open(checkpoint) as fp:
+        state = json.load(fp)
+    assert state["VideoLibrary.GetMovies"]["offset"] == 15
+    assert not state["VideoLibrary.GetMovies"]["done"]
+    assert state["AudioLibrary.GetSongs"]["done"]
+
+    # Resume where it stopped
+    server = FakeServer()
+    exporter = Exporter(fake_endpoint(server), str(tmp_path), fmt="csv", page_size=5, checkpoint=checkpoint)
+    counts = exporter.export(["VideoLibrary.GetMovies", "AudioLibrary.GetSongs"], extra_params)
+    assert counts == {"VideoLibrary.GetMovies": 23, "AudioLibrary.GetSongs": 7}
+    assert sorted(server.requests) == [("VideoLibrary.GetMovies", 15), ("VideoLibrary.GetMovies", 20)]
+
+    with open(exporter.output_path("VideoLibrary.GetMovies"), newline="") as fp:
+        rows = list(csv.reader(fp))
+    assert rows[0] == ["movieid", "title", "genre"]
+    assert rows[1:] == [[str(m["movieid"]), m["title"], '["a", "b"]'] for m in TEST_MOVIES]
+
+
+@pytest.mark.parametrize("compress", [True, False])
+def test_export_crash_resume(tmp_path, compress):
+    checkpoint = str(tmp_path / "checkpoint.json")
+    exporter = Exporter(
+        fake_endpoint(FakeServer(fail_at=15)), str(tmp_path), compress=compress, page_size=5, checkpoint=checkpoint
+    )
+    with pytest.raises(JsonRpcClientError):
+        exporter.export(["VideoLibrary.GetMovies"])
+
+    # Process killed while writing a page: data after the last page saved, unterminated
+    path = exporter.output_path("VideoLibrary.GetMovies")
+    partial = json.dumps(TEST_MOVIES[15]).encode()[:10]
+    with open(path, "ab") as fp:
+        fp.write(gzip.compress(partial)[:15] if compress else partial)
+
+    exporter = Exporter(
+        fake_endpoint(FakeServer()), str(tmp_path), compress=compress, page_size=5, checkpoint=checkpoint
+    )
+    assert exporter.export(["VideoLibrary.GetMovies"]) == {"VideoLibrary.GetMovies": 23}
+    assert read_ndjson(path, compress) == TEST_MOVIES
+
+
+@pytest.mark.parametrize("parallelism", [1, 4])
+def test_export_capped_pages(tmp_path, parallelism):
+    server = FakeServer(cap=3)
+    exporter = Exporter(fake_endpoint(server), str(tmp_path), page_size=5, parallelism=parallelism)
+    assert exporter.export(["VideoLibrary.GetMovies"]) == {"VideoLibrary.GetMovies": 23}
+    assert read_ndjson(exporter.output_path("VideoLibrary.GetMovies")) == TEST_MOVIES
+
+
+def test_export_processes(tmp_path):
+    server = FakeServer()
+    cli = fake_endpoint(server)
+    exporter = Exporter(cli, str(tmp_path), page_size=5, processes=2)
+    assert exporter.export(["VideoLibrary.GetMovies", "Some.List"]) == {"VideoLibrary.GetMovies": 23, "Some.List": 2}
+    assert read_ndjson(exporter.output_path("VideoLibrary.GetMovies")) == TEST_MOVIES
+    assert cli.client.request_bytes.call_count == 6
+    cli.client.request.assert_not_called()
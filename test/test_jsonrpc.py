@@ -76,6 +76,19 @@ TEST_METH_NLIST_2 = list(TEST_METH_LIST_2['methods'].keys())
 TEST_METH_NLIST_3 = ["Some3.Method1", "Some3.Method2"]
 
 
+class JsonPayload:
+    """Matches an encoded json payload against its expected decoded content."""
+
+    def __init__(self, expected):
+        self.expected = expected
+
+    def __eq__(self, other):
+        return json.loads(other) == self.expected
+
+    def __repr__(self):
+        return f"JsonPayload({self.expected})"
+
+
 def mock_response(code, data_dict):
     resp = Mock()
     resp.status_code = code
@@ -215,9 +228,9 @@ def test_client_attribute_method(mock_post, mock_get):
     pl2 = { "jsonrpc": "2.0", "method": "some.bad.withparam", "params": {"param1": "a", "param2": "b"}, "id": ANY}
     pl3 = { "jsonrpc": "2.0", "method": "some.cool.alsowithparams", "params": {"param4": "c", "param5": "d"}, "id": ANY}
     calls = [
-        call(TEST_URL, headers=TEST_HEADERS, json=pl1, auth=None),
-        call(TEST_URL, headers=TEST_HEADERS, json=pl2, auth=None),
-        call(TEST_URL, headers=TEST_HEADERS, json=pl3, auth=None),
+        call(TEST_URL, headers=TEST_HEADERS, data=JsonPayload(pl1), auth=None),
+        call(TEST_URL, headers=TEST_HEADERS, data=JsonPayload(pl2), auth=None),
+        call(TEST_URL, headers=TEST_HEADERS, data=JsonPayload(pl3), auth=None),
     ]
     mock_post.assert_has_calls(calls, any_order=True)
 
@@ -263,11 +276,53 @@ def test_client_run_method(mock_post, mock_get):
     pl3 = { "jsonrpc": "2.0", "method": "some.cool.thing", "params": {}, "id": ANY}
     pl2 = { "jsonrpc": "2.0", "method": "some.bad.withparam", "params": {"param1": "a", "param2": "b"}, "id": ANY}
     calls = [
-        call(TEST_URL, headers=TEST_HEADERS, json=pl1, auth=None),
-        call(TEST_URL, headers=TEST_HEADERS, json=pl2, auth=None),
-        call(TEST_URL, headers=TEST_HEADERS, json=pl3, auth=None),
+        call(TEST_URL, headers=TEST_HEADERS, data=JsonPayload(pl1), auth=None),
+        call(TEST_URL, headers=TEST_HEADERS, data=JsonPayload(pl2), auth=None),
+        call(TEST_URL, headers=TEST_HEADERS, data=JsonPayload(pl3), auth=None),
     ]
     mock_post.assert_has_calls(calls, any_order=True)
 
     cli.client = None
     assert cli.run_method("method", raw = True) == {}
+
+
+@pytest.mark.parametrize("uuid_ids", [True, False])
+@patch("pysonrpc.jsonrpc.requests.post")
+def test_client_payload_encoding(mock_post, uuid_ids):
+    mock_post.return_value = mock_response(200, [{"result": "data"}] * 4)
+    client = JsonRpcClient(TEST_URL, uuid_ids=uuid_ids)
+    headers = {"X-Test": "1"}
+
+    assert JsonRpcClient.payload_prefix('some."method') == b'{"jsonrpc":"2.0","method":"some.\\"method","params":'
+    client.request("some.method", {"a": [1, "é"]}, headers=headers)
+    client.request("some.method", req_id="my-id")
+    client.request("some.method", payload_prefix=JsonRpcClient.payload_prefix("other.method"))
+    assert headers == {"X-Test": "1"}
+
+    payloads = [json.loads(c.kwargs["data"]) for c in mock_post.call_args_list]
+    assert payloads[0]["params"] == {"a": [1, "é"]}
+    assert payloads[1]["id"] == "my-id"
+    assert payloads[2]["method"] == "other.method"
+    if uuid_ids:
+        assert len(payloads[0]["id"]) == 32 and payloads[0]["id"] != payloads[2]["id"]
+    else:
+        assert (payloads[0]["id"], payloads[2]["id"]) == (1, 2)
+    assert mock_post.call_args_list[0].kwargs["headers"] == {"X-Test": "1", **TEST_HEADERS}
+    assert mock_post.call_args_list[1].kwargs["headers"] == TEST_HEADERS
+
+    # Params that can't be encoded as strict json are client errors, and never sent
+    for params in ({"d": object()}, {"n": float("nan")}):
+        with pytest.raises(JsonRpcClientError):
+            client.request("some.method", params)
+    assert mock_post.call_count == 3
+
+
+def test_client_session():
+    session = Mock()
+    session.post.return_value = mock_response(200, [{"result": "data"}])
+    session.get.return_value = mock_response(200, [TEST_METH_LIST_1])
+    cli = JsonRpcEndpoint(TEST_URL, client=JsonRpcClient(TEST_URL, session=session), auto_detect=True)
+
+    assert cli.run_method("some.method", raw=False) == "data"
+    session.get.assert_called_once_with(TEST_URL, headers=TEST_HEADERS, auth=None)
+    session.post.assert_called_once()
@@ -0,0 +1,161 @@
+import pytest
+import threading
+import time
+from unittest.mock import patch, Mock
+from pysonrpc.limiter import AdaptiveConcurrencyLimit, RequestLimiter, TokenBucket
+from pysonrpc.jsonrpc import JsonRpcEndpoint, JsonRpcClientError
+
+TEST_URL = "http://127.0.0.1:8080/path"
+
+
+def mock_response(code):
+    resp = Mock()
+    resp.status_code = code
+    resp.json.return_value = {"result": "data"}
+    return resp
+
+
+def wait_for(condition, timeout=5):
+    """Poll a condition rather than sleeping a fixed time, to stay reliable on loaded machines."""
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert condition()
+
+
+def test_token_bucket():
+    bucket = TokenBucket(rate=100, burst=2)
+    now = time.monotonic()
+    assert bucket.acquire(now)
+    assert bucket.acquire(now)
+    # Bucket empty, no wait allowed
+    assert not bucket.acquire(time.monotonic())
+    start = time.monotonic()
+    assert bucket.acquire(start + 1)
+    assert 0.005 < time.monotonic() - start < 0.5
+
+
+def test_limiter_rates():
+    ns_bucket = TokenBucket(10)
+    limiter = RequestLimiter({"VideoLibrary": ns_bucket, "VideoLibrary.GetMovies": 5, "*": 1})
+    assert limiter._bucket("VideoLibrary.GetMovies").rate == 5
+    assert limiter._bucket("VideoLibrary.GetMovieDetails") is ns_bucket
+    assert limiter._bucket("Player.Open").rate == 1
+    assert RequestLimiter({"VideoLibrary": 1})._bucket("Player.Open") is None
+
+
+def test_concurrency_aimd():
+    changes = []
+    limit = AdaptiveConcurrencyLimit(initial=2, min_limit=1, max_limit=4, on_change=changes.append)
+    deadline = time.monotonic()
+
+    # Saturated with fast calls: limit grows
+    for _ in range(20):
+        acquired = 0
+        while limit.acquire(deadline):
+            acquired += 1
+        assert acquired == limit.limit
+        for _ in range(acquired):
+            limit.release(0.01)
+    assert limit.limit == 4
+
+    # Latency degrading or overload: limit shrinks down to the minimum
+    for _ in range(30):
+        limit.acquire(deadline)
+        limit.release(1.0)
+    assert limit.limit == 1
+    limit.acquire(deadline)
+    limit.release(0.01, overloaded=True)
+    assert limit.limit == 1
+
+    stats = limit.stats()
+    assert stats["limit_changes"] == len(changes) > 1
+    assert stats["in_flight"] == stats["queued"] == 0
+
+
+def test_concurrency_mixed_latencies():
+    limit = AdaptiveConcurrencyLimit(initial=20, max_limit=20)
+    deadline = time.monotonic()
+    # Healthy server, cheap and expensive methods interleaved
+    for _ in range(100):
+        for method, latency in (("Cheap.Method", 0.005), ("Expensive.Method", 0.05)):
+            assert limit.acquire(deadline)
+            limit.release(latency, key=method)
+    assert limit.limit == 20
+    assert limit.stats()["min_latencies"] == {"Cheap.Method": 0.005, "Expensive.Method": 0.05}
+
+    # An actually degrading method still shrinks the limit
+    for _ in range(10):
+        limit.acquire(deadline)
+        limit.release(0.5, key="Expensive.Method")
+    assert limit.limit < 20
+
+
+def test_concurrency_queue():
+    limit = AdaptiveConcurrencyLimit(initial=1)
+    assert limit.acquire(time.monotonic())
+    waiter = threading.Thread(target=lambda: limit.acquire(time.monotonic() + 5))
+    waiter.start()
+    wait_for(lambda: limit.stats()["queued"] == 1)
+    limit.release(0.01)
+    waiter.join()
+    assert limit.stats()["queued"] == 0
+    assert limit.stats()["in_flight"] == 1
+
+
+@patch("pysonrpc.jsonrpc.requests.post")
+def test_client_limiter(mock_post):
+    mock_post.side_effect = [mock_response(200), mock_response(503), Exception("error")]
+    limiter = RequestLimiter(concurrency=AdaptiveConcurrencyLimit(initial=10, backoff=0.5), max_wait=0)
+    cli = JsonRpcEndpoint(TEST_URL, limiter=limiter)
+    assert cli.client.limiter is limiter
+
+    assert cli.run_method("Some.Method", raw=False) == "data"
+    assert limiter.stats()["limit"] == 10
+    with pytest.raises(Exception):
+        cli.run_method("Some.Method", raw=False)
+    with pytest.raises(JsonRpcClientError):
+        cli.run_method("Some.Method", raw=False)
+    assert limiter.stats()["limit"] == 2
+    assert limiter.stats()["in_flight"] == 0
+
+    # Limits not cleared in time
+    limiter = RequestLimiter({"*": TokenBucket(1, burst=1)}, max_wait=0)
+    cli = JsonRpcEndpoint(TEST_URL, limiter=limiter)
+    mock_post.side_effect = None
+    mock_post.return_value = mock_response(200)
+    assert cli.run_method("Some.Method", raw=False) == "data"
+    with pytest.raises(JsonRpcClientError):
+        cli.run_method("Some.Method", raw=False)
+    assert mock_post.call_count == 4
+    assert limiter.stats() == {"rate_queued": {"*": 0}, "queued": 0}
+
+    # Calls refused for lack of a concurrency slot don't use up the rate
+    bucket = TokenBucket(1, burst=1)
+    concurrency = AdaptiveConcurrencyLimit(initial=1)
+    limiter = RequestLimiter({"*": bucket}, concurrency=concurrency, max_wait=0)
+    assert concurrency.acquire(time.monotonic())
+    assert limiter.acquire("Some.Method") is None
+    assert bucket.acquire(time.monotonic())
+
+
+def test_limiter_queue_stats():
+    limiter = RequestLimiter(
+        {"Player": TokenBucket(1, burst=1)}, concurrency=AdaptiveConcurrencyLimit(initial=1), max_wait=5
+    )
+    slot = limiter.acquire("Player.Open")
+    assert limiter.stats()["queued"] == 0
+
+    # One call sleeping for a token, the other waiting for the concurrency slot
+    threads = [threading.Thread(target=limiter.acquire, args=(method,)) for method in ("Player.Open", "Some.Method")]
+    for thread in threads:
+        thread.start()
+    wait_for(lambda: limiter.stats()["queued"] == 2)
+    stats = limiter.stats()
+    assert stats["rate_queued"] == {"Player": 1}
+    assert stats["queued"] == 2
+
+    limiter.release(slot)
+    for thread in threads:
+        thread.join()
+    assert limiter.stats()["queued"] == 0
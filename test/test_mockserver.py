@@ -0,0 +1,137 @@
+import pytest
+import json
+import socket
+from unittest.mock import patch, Mock
+from pysonrpc.jsonrpc import JsonRpcClient, JsonRpcEndpoint, JsonRpcServerError
+from pysonrpc.mockserver import JsonRpcMockServer
+from pysonrpc.recording import TrafficRecorder, read_recordings
+
+TEST_URL = "http://127.0.0.1:8080/path"
+TEST_METH_FILE = "test/methods.json"
+TEST_SCHEMA = {
+    "methods": {
+        "Some.Method": {"returns": {"$ref": "Some.Details"}},
+        "Some.Other": {"returns": {"type": "array", "items": {"type": ["integer", "null"]}}},
+    },
+    "types": {
+        "Some.Details": {
+            "type": "object",
+            "properties": {
+                "name": {"type": "string"},
+                "kind": {"type": "string", "enum": ["a", "b"]},
+                "rating": {"type": "number", "default": 5.0},
+                "nested": {"$ref": "Some.Details"},
+            },
+        }
+    },
+}
+
+
+def mock_response(code, data):
+    resp = Mock()
+    resp.status_code = code
+    resp.json.return_value = data
+    return resp
+
+
+@pytest.fixture
+def recording(tmp_path):
+    path = str(tmp_path / "recording.ndjson")
+    with patch("pysonrpc.jsonrpc.requests.post") as mock_post:
+        mock_post.side_effect = [
+            mock_response(200, {"result": {"movieid": 1}}),
+            mock_response(200, {"result": {"movieid": 2}}),
+            mock_response(200, {"error": {"code": -32602, "message": "Invalid params"}}),
+        ]
+        cli = JsonRpcEndpoint(TEST_URL, record=path)
+        cli.run_method("VideoLibrary.GetMovieDetails", movieid=1)
+        cli.run_method("VideoLibrary.GetMovieDetails", movieid=2)
+        cli.run_method("VideoLibrary.GetMovieDetails", movieid="bad")
+        cli.client.recorder.close()
+    return path
+
+
+@pytest.fixture
+def server(recording):
+    with open(TEST_METH_FILE) as fp:
+        schema = json.load(fp)
+    mock = JsonRpcMockServer([recording], schema=schema)
+    http = mock.serve_http(port=0)
+    tcp = mock.serve_tcp(port=0)
+    yield mock, http.server_address[1], tcp.server_address[1]
+    mock.shutdown()
+
+
+def test_recording(recording):
+    entries = list(read_recordings(recording))
+    assert len(entries) == 3
+    assert entries[0]["method"] == "VideoLibrary.GetMovieDetails"
+    assert entries[0]["params"] == {"movieid": 1}
+    assert entries[0]["result"] == {"movieid": 1}
+    assert entries[0]["elapsed"] >= 0
+    assert entries[2]["error"]["code"] == -32602
+    assert list(read_recordings(recording, method="Other.Method")) == []
+
+
+def test_synthetic_value():
+    mock = JsonRpcMockServer(schema=TEST_SCHEMA)
+    value = mock.synthetic_value({"$ref": "Some.Details"})
+    assert value["name"] == "" and value["kind"] == "a" and value["rating"] == 5.0
+    assert value["nested"]["nested"]["name"] == ""
+    assert mock.synthetic_value({"$ref": "Unknown"}) is None
+    assert json.loads(mock.handle(b'{"jsonrpc":"2.0","id":1,"method":"Some.Other"}')) == {
+        "jsonrpc": "2.0", "id": 1, "result": [0]
+    }
+
+
+def test_mock_http(server):
+    mock, http_port, _ = server
+    cli = JsonRpcEndpoint(f"http://127.0.0.1:{http_port}", auto_detect=True)
+    assert sorted(cli.methods.keys()) == ["Some3.Method1", "Some3.Method2"]
+
+    assert cli.run_method("VideoLibrary.GetMovieDetails", movieid=2, raw=False) == {"movieid": 2}
+    assert cli.run_method("VideoLibrary.GetMovieDetails", movieid=1, raw=False) == {"movieid": 1}
+    # Unknown params fall back to the first recorded response of the method
+    assert cli.run_method("VideoLibrary.GetMovieDetails", movieid=3, raw=False) == {"movieid": 1}
+    with pytest.raises(JsonRpcServerError):
+        cli.run_method("VideoLibrary.GetMovieDetails", movieid="bad", raw=False)
+    assert cli.Some3.Method1(addonid="a", raw=False) == {"addon": None, "limits": None}
+    assert cli.run_method("Unknown.Method")["error"]["code"] == JsonRpcClient.JSONRPC_METHOD_NOT_FOUND
+
+
+def test_mock_batch(server):
+    mock, _, tcp_port = server
+    batch = [
+        {"jsonrpc": "2.0", "id": 1, "method": "VideoLibrary.GetMovieDetails", "params": {"movieid": 2}},
+        {"jsonrpc": "2.0", "method": "VideoLibrary.GetMovieDetails", "params": {"movieid": 1}},
+        {"jsonrpc": "2.0", "id": "b", "method": "Unknown.Method"},
+        "invalid",
+    ]
+    with socket.create_connection(("127.0.0.1", tcp_port)) as sock:
+        sock.sendall(json.dumps(batch).encode() + b"\n" + b"{invalid\n")
+        fp = sock.makefile("rb")
+        responses = json.loads(fp.readline())
+        parse_error = json.loads(fp.readline())
+
+    assert responses[0] == {"jsonrpc": "2.0", "id": 1, "result": {"movieid": 2}}
+    assert responses[1]["id"] == "b"
+    assert responses[1]["error"]["code"] == JsonRpcClient.JSONRPC_METHOD_NOT_FOUND
+    assert responses[2]["error"]["code"] == JsonRpcClient.JSONRPC_INVALID_REQUEST
+    assert len(responses) == 3
+    assert parse_error["error"]["code"] == JsonRpcClient.JSONRPC_PARSE_ERROR
+    assert json.loads(mock.handle(b"[]"))["error"]["code"] == JsonRpcClient.JSONRPC_INVALID_REQUEST
+    assert mock.handle(b'[{"jsonrpc":"2.0","method":"Some.Method"}]') is None
+
+
+def test_mock_latency(tmp_path):
+    path = str(tmp_path / "recording.ndjson")
+    recorder = TrafficRecorder(path)
+    recorder.record("Some.Method", {}, {"result": 1}, 0.2)
+    recorder.close()
+
+    with patch("pysonrpc.mockserver.time.sleep") as mock_sleep:
+        JsonRpcMockServer([path], latency_scale=0.5).handle(b'{"jsonrpc":"2.0","id":1,"method":"Some.Method"}')
+        mock_sleep.assert_called_once_with(0.1)
+        mock_sleep.reset_mock()
+        JsonRpcMockServer([path]).handle(b'{"jsonrpc":"2.0","id":1,"method":"Some.Method"}')
+        mock_sleep.assert_not_called()
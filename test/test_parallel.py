@@ -0,0 +1,54 @@
+import pytest
+import json
+from unittest.mock import patch, Mock
+from pysonrpc.jsonrpc import JsonRpcEndpoint, JsonRpcServerError
+from pysonrpc.parallel import ProcessDecoder
+
+TEST_URL = "http://127.0.0.1:8080/path"
+
+
+def count_movies(result):
+    return len(result["movies"])
+
+
+def mock_post(url, data=None, **kwargs):
+    """Answers GetMovies with as many movies as the requested movie count, as raw bytes and json."""
+    payload = json.loads(data)
+    count = payload["params"].get("count", 0)
+    if count < 0:
+        body = {"jsonrpc": "2.0", "id": payload["id"], "error": {"code": -32602, "message": "Invalid params"}}
+    else:
+        body = {"jsonrpc": "2.0", "id": payload["id"], "result": {"movies": [{"movieid": i} for i in range(count)]}}
+    resp = Mock()
+    resp.status_code = 200
+    resp.content = json.dumps(body).encode()
+    resp.json.return_value = body
+    return resp
+
+
+@pytest.mark.parametrize("shm_threshold", [0, 1 << 20])
+def test_process_decoder(shm_threshold):
+    body = json.dumps({"jsonrpc": "2.0", "id": 1, "result": {"movies": [{"movieid": 1}] * 1000}}).encode()
+    error = json.dumps({"jsonrpc": "2.0", "id": 1, "error": {"code": 1, "message": "error"}}).encode()
+    with ProcessDecoder(2, shm_threshold=shm_threshold) as decoder:
+        assert decoder.submit(body, count_movies).result() == 1000
+        assert decoder.submit(body).result()["movies"][0] == {"movieid": 1}
+        with pytest.raises(JsonRpcServerError):
+            decoder.submit(error).result()
+
+
+@pytest.mark.parametrize("processes", [None, 2])
+@patch("pysonrpc.jsonrpc.requests.post")
+def test_endpoint_map(mock_requests_post, processes):
+    mock_requests_post.side_effect = mock_post
+    cli = JsonRpcEndpoint(TEST_URL)
+
+    counts = list(range(50))
+    results = cli.map("VideoLibrary.GetMovies", ({"count": c} for c in counts), count_movies, threads=4, processes=processes)
+    assert list(results) == counts
+    assert list(cli.map("VideoLibrary.GetMovies", [{"count": 2}], processes=processes)) == [
+        {"movies": [{"movieid": 0}, {"movieid": 1}]}
+    ]
+
+    with pytest.raises(JsonRpcServerError):
+        list(cli.map("VideoLibrary.GetMovies", [{"count": 1}, {"count": -1}], processes=processes))
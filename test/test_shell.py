@@ -0,0 +1,125 @@
+import pytest
+import io
+import json
+from unittest.mock import patch, Mock
+from pysonrpc.jsonrpc import JsonRpcEndpoint
+from pysonrpc.shell import JsonRpcShell
+
+TEST_URL = "http://127.0.0.1:8080/path"
+TEST_METH_FILE = "test/methods.json"
+TEST_SCHEMA = {
+    "methods": {
+        "VideoLibrary.GetMovieDetails": {"params": [{"name": "movieid"}, {"name": "properties"}]},
+        "VideoLibrary.GetMovies": {"params": [{"name": "limits"}]},
+        "Player.Open": {},
+    }
+}
+
+
+def mock_response(code, data):
+    resp = Mock()
+    resp.status_code = code
+    resp.json.return_value = data
+    return resp
+
+
+def run_shell(commands):
+    out = io.StringIO()
+    shell = JsonRpcShell(JsonRpcEndpoint(TEST_URL, schema=TEST_SCHEMA), stdin=io.StringIO(commands), stdout=out)
+    shell.cmdloop(intro="")
+    return out.getvalue()
+
+
+@patch("pysonrpc.jsonrpc.requests.post")
+def test_shell_run(mock_post):
+    mock_post.return_value = mock_response(200, {"result": {"moviedetails": {"movieid": 1}}})
+    output = run_shell(
+        "run VideoLibrary.GetMovieDetails movieid=1 properties='[\"title\"]'\n"
+        'VideoLibrary.GetMovieDetails {"movieid": 2}\n'
+        "raw\n"
+        "Player.Open item=file.mkv\n"
+        "raw off\n"
+        "run Player.Open bad\n"
+        "run\n"
+        "\n"
+        "exit\n"
+    )
+
+    payloads = [json.loads(c.kwargs["data"]) for c in mock_post.call_args_list]
+    assert [p["params"] for p in payloads] == [
+        {"movieid": 1, "properties": ["title"]},
+        {"movieid": 2},
+        {"item": "file.mkv"},
+    ]
+    assert output.count('"movieid": 1') == 3
+    assert '"result": {' in output
+    assert output.count(" ms)") == 3
+    assert "Error: Invalid parameter 'bad'" in output
+    assert "Error: Method name required" in output
+
+
+@patch("pysonrpc.jsonrpc.requests.post")
+def test_shell_errors(mock_post):
+    mock_post.side_effect = Exception("connection refused")
+    output = run_shell("Player.Open\n")
+    assert "Error: Request error: connection refused" in output
+
+
+@patch("pysonrpc.jsonrpc.requests.post")
+def test_shell_reserved_params(mock_post):
+    mock_post.return_value = mock_response(200, {"result": "OK"})
+    output = run_shell("run a.b raw=1 method=x\n")
+    assert json.loads(mock_post.call_args.kwargs["data"])["params"] == {"raw": 1, "method": "x"}
+    assert '"OK"' in output
+
+
+@patch("pysonrpc.jsonrpc.requests.post")
+def test_shell_interrupt(mock_post):
+    mock_post.side_effect = [KeyboardInterrupt, mock_response(200, {"result": "OK"})]
+    output = run_shell("Player.Open\nPlayer.Open\n")
+    assert "Interrupted" in output
+    assert '"OK"' in output
+
+
+def test_shell_prompt_interrupt():
+    class InterruptedInput(io.StringIO):
+        """Input interrupted by a Ctrl-C at the first prompt."""
+        interrupted = False
+
+        def readline(self, *args):
+            if not self.interrupted:
+                self.interrupted = True
+                raise KeyboardInterrupt
+            return super().readline(*args)
+
+    out = io.StringIO()
+    shell = JsonRpcShell(JsonRpcEndpoint(TEST_URL, schema=TEST_SCHEMA), stdin=InterruptedInput("list\nexit\n"), stdout=out)
+    shell.cmdloop()
+    output = out.getvalue()
+    assert output.count(JsonRpcShell.intro) == 1
+    assert "^C" in output
+    assert "VideoLibrary.GetMovies" in output
+
+
+def test_shell_list():
+    output = run_shell("list VideoLibrary\ndescribe VideoLibrary.GetMovies\ndescribe Unknown\n")
+    assert "VideoLibrary.GetMovieDetails" in output and "Player.Open" not in output
+    assert '"name": "limits"' in output
+    assert "Unknown method Unknown" in output
+
+
+def test_shell_completion():
+    shell = JsonRpcShell(JsonRpcEndpoint(TEST_URL, schema=TEST_SCHEMA))
+    assert shell.completenames("Vid") == ["VideoLibrary."]
+    assert shell.completenames("r") == ["raw", "run"]
+    assert shell.complete_run("VideoLibrary.GetM", "run VideoLibrary.GetM", 4, 21) == [
+        "VideoLibrary.GetMovieDetails",
+        "VideoLibrary.GetMovies",
+    ]
+    assert shell.complete_list("P", "list P", 5, 6) == ["Player."]
+
+    line = "run VideoLibrary.GetMovieDetails movieid=1 "
+    assert shell.complete_run("", line, len(line), len(line)) == ["properties="]
+    line = "VideoLibrary.GetMovieDetails m"
+    assert shell.completedefault("m", line, len(line) - 1, len(line)) == ["movieid="]
+    assert shell.completedefault("", "Unknown.Method ", 15, 15) == []
@@ -0,0 +1,87 @@
+import pytest
+import base64
+import io
+import json
+from pysonrpc.jsonrpc import JsonRpcClient, JsonRpcEndpoint
+from pysonrpc.mockserver import JsonRpcMockServer
+from pysonrpc.recording import read_recordings
+from pysonrpc.streaming import Stream, has_streams, iter_json, iter_payload
+
+TEST_DATA = bytes(range(256)) * 41
+
+
+def decode(chunks):
+    return json.loads(b"".join(chunks))
+
+
+def test_has_streams():
+    assert not has_streams({"a": [1, {"b": "c"}], "d": "text", "e": b"bytes", "f": io.StringIO("")})
+    assert not has_streams({"a": [Stream(iter([1]))]})
+    assert not has_streams([Stream(iter([1]))])
+    assert has_streams({"a": 1, "b": Stream(io.StringIO(""))})
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 1024])
+def test_iter_json(chunk_size):
+    params = {
+        "binary": Stream(io.BytesIO(TEST_DATA)),
+        "text": Stream(io.StringIO('some "quoted"\ntext é')),
+        "items": Stream({"movieid": i, "art": Stream(io.StringIO("x" * i))} for i in range(3)),
+        "list": Stream([1, [2, 3]]),
+        "empty": Stream(iter([])),
+        "plain": {"a": [1, 2]},
+    }
+    assert decode(iter_json(params, chunk_size)) == {
+        "binary": base64.b64encode(TEST_DATA).decode(),
+        "text": 'some "quoted"\ntext é',
+        "items": [{"movieid": i, "art": "x" * i} for i in range(3)],
+        "list": [1, [2, 3]],
+        "empty": [],
+        "plain": {"a": [1, 2]},
+    }
+
+
+def test_payload_encoding():
+    client = JsonRpcClient("http://localhost")
+    assert isinstance(client._encode_jsonrpc_payload("Some.Method", {"a": [1]}), bytes)
+    assert isinstance(client._encode_jsonrpc_payload("Some.Method", [1, 2]), bytes)
+    payload = client._encode_jsonrpc_payload("Some.Method", {"a": Stream(iter([1]))})
+    assert not isinstance(payload, bytes)
+    assert decode(payload)["params"] == {"a": [1]}
+
+
+def test_iter_payload_chunks():
+    chunks = list(iter_payload(b'{"params":', {"data": Stream(io.BytesIO(TEST_DATA))}, b',"id":1}', 1000))
+    assert decode(chunks) == {"params": {"data": base64.b64encode(TEST_DATA).decode()}, "id": 1}
+    # Memory stays bounded by the chunk size, whatever the data size
+    assert len(chunks) > 10
+    assert max(len(chunk) for chunk in chunks) < 2000
+
+
+class CapturingMockServer(JsonRpcMockServer):
+    def handle(self, body):
+        self.body = body
+        return super().handle(body)
+
+
+def test_streamed_request(tmp_path):
+    mock = CapturingMockServer(schema={"methods": {"VideoLibrary.SetMovieDetails": {"returns": {"type": "string"}}}})
+    port = mock.serve_http(port=0).server_address[1]
+    record = str(tmp_path / "recording.ndjson")
+    try:
+        client = JsonRpcClient(f"http://127.0.0.1:{port}", record=record)
+        client.STREAM_CHUNK_SIZE = 1024
+        art = Stream(io.BytesIO(TEST_DATA))
+        assert client.request("VideoLibrary.SetMovieDetails", {"movieid": 1, "art": art}, raw=False) == ""
+        request = json.loads(mock.body)
+        assert request["method"] == "VideoLibrary.SetMovieDetails"
+        assert request["params"] == {"movieid": 1, "art": base64.b64encode(TEST_DATA).decode()}
+        # Streamed values are recorded as a stable placeholder
+        assert next(read_recordings(record))["params"] == {"movieid": 1, "art": Stream.PLACEHOLDER}
+
+        # Items streamed from a generator, through a method
+        cli = JsonRpcEndpoint(f"http://127.0.0.1:{port}", auto_detect=True)
+        cli.VideoLibrary.SetMovieDetails(movies=Stream({"movieid": i} for i in range(1000)))
+        assert json.loads(mock.body)["params"]["movies"] == [{"movieid": i} for i in range(1000)]
+    finally:
+        mock.shutdown()
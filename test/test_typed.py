@@ -0,0 +1,105 @@
+import pytest
+import dataclasses
+from unittest.mock import patch, Mock
+from pysonrpc.jsonrpc import JsonRpcEndpoint, JsonRpcClientError
+from pysonrpc.typed import ResultDecoder
+
+TEST_URL = "http://127.0.0.1:8080/path"
+TEST_SCHEMA = {
+    "methods": {
+        "VideoLibrary.GetMovies": {
+            "returns": {
+                "type": "object",
+                "properties": {
+                    "movies": {"type": "array", "items": {"$ref": "Video.Details.Movie"}},
+                    "limits": {"$ref": "List.LimitsReturned"},
+                },
+            }
+        },
+        "VideoLibrary.Clean": {"returns": {"type": "string"}},
+    },
+    "types": {
+        "Video.Details.Base": {"type": "object", "properties": {"label": {"type": "string"}}},
+        "Video.Details.Movie": {
+            "extends": "Video.Details.Base",
+            "properties": {
+                "movieid": {"type": "integer"},
+                "3d": {"type": "boolean"},
+                "class": {"type": "string"},
+                "cast": {"type": "array", "items": {"type": "object", "properties": {"name": {"type": "string"}}}},
+            },
+        },
+        "List.LimitsReturned": {"type": "object", "properties": {"start": {}, "end": {}, "total": {}}},
+    },
+}
+TEST_RESULT = {
+    "movies": [
+        {"movieid": 1, "label": "one", "3d": True, "class": "a", "cast": [{"name": "x", "role": "y"}], "extra": 1},
+        {"movieid": 2, "label": "two"},
+    ],
+    "limits": {"start": 0, "end": 2, "total": 2},
+}
+
+
+def mock_response(code, data):
+    resp = Mock()
+    resp.status_code = code
+    resp.json.return_value = data
+    return resp
+
+
+def test_decoder_invalid():
+    with pytest.raises(JsonRpcClientError):
+        ResultDecoder(unknown="bad")
+
+
+@pytest.mark.parametrize("unknown", [ResultDecoder.UNKNOWN_DROP, ResultDecoder.UNKNOWN_KEEP])
+def test_decoder(unknown):
+    decoder = ResultDecoder(TEST_SCHEMA["types"], unknown)
+    returns = TEST_SCHEMA["methods"]["VideoLibrary.GetMovies"]["returns"]
+    result = decoder.decode(returns, TEST_RESULT)
+
+    movie = result.movies[0]
+    assert type(movie).__name__ == "VideoDetailsMovie"
+    assert not hasattr(movie, "__dict__")
+    assert (movie.movieid, movie.label, movie._3d, movie._class) == (1, "one", True, "a")
+    assert movie.cast[0].name == "x"
+    assert result.movies[1].cast is None
+    assert type(result.movies[1]) is type(movie)
+    assert result.limits.total == 2
+    if unknown == ResultDecoder.UNKNOWN_KEEP:
+        assert movie._extra == {"extra": 1}
+        assert movie.cast[0]._extra == {"role": "y"}
+        assert result.movies[1]._extra is None
+    else:
+        assert "_extra" not in {field.name for field in dataclasses.fields(movie)}
+
+    # Classes are generated once per type
+    assert type(decoder.decode(returns, TEST_RESULT).movies[0]) is type(movie)
+    assert decoder.decode(None, TEST_RESULT) is TEST_RESULT
+    assert decoder.decode({"type": "array"}, [1]) == [1]
+
+
+def test_decoder_name_collisions():
+    definition = {"type": "object", "properties": {"a-b": {}, "a_b": {}, "a b": {}, "_extra": {}}}
+    decoder = ResultDecoder(unknown=ResultDecoder.UNKNOWN_KEEP)
+    result = decoder.decode(definition, {"a-b": 1, "a_b": 2, "a b": 3, "_extra": 4, "other": 5})
+    assert (result.a_b, result.a_b_2, result.a_b_3, result._extra_2) == (1, 2, 3, 4)
+    assert result._extra == {"other": 5}
+
+
+@patch("pysonrpc.jsonrpc.requests.post")
+def test_endpoint_typed_results(mock_post):
+    mock_post.return_value = mock_response(200, {"result": TEST_RESULT})
+    cli = JsonRpcEndpoint(TEST_URL, schema=TEST_SCHEMA, typed_results=True)
+    assert "Video.Details.Movie" in cli.types
+
+    assert cli.VideoLibrary.GetMovies(raw=False).movies[0].movieid == 1
+    assert cli.run_method("VideoLibrary.GetMovies", raw=False).limits.end == 2
+    assert cli.run_method("VideoLibrary.GetMovies") == {"result": TEST_RESULT}
+    assert cli.run_method("Unknown.Method", raw=False) == TEST_RESULT
+    movies = list(cli.map("VideoLibrary.GetMovies", [{}, {}], lambda result: result.movies))
+    assert [movies[0][0].movieid, movies[1][1].label] == [1, "two"]
+
+    cli = JsonRpcEndpoint(TEST_URL, schema=TEST_SCHEMA)
+    assert cli.VideoLibrary.GetMovies(raw=False) == TEST_RESULT